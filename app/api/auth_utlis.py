@@ -1,10 +1,11 @@
 from datetime import datetime, timedelta, timezone
 from uuid import UUID
 from jose import JWTError, jwt
+from functools import lru_cache
 from typing import Optional
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings
 
 
 
@@ -18,12 +19,89 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"  # Default value
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30  
     DATABASE_URL: str
+    # Adds X-DB-Queries / X-DB-Time headers to every response
+    DEBUG: bool = False
+    # Warn when one statement shape runs more than this many times in a request (0 disables)
+    N_PLUS_ONE_THRESHOLD: int = 10
+    # Async engine mode (AsyncSession + asyncpg)
+    DB_ASYNC: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Connection pool (per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_USE_LIFO: bool = False
+    # Reload interval for the in-process order status registry (None = only on local writes)
+    STATUS_CACHE_TTL_SECONDS: Optional[float] = 300
+    # Cache of verified tokens and the slim principal behind them
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60
+    # bcrypt cost and the worker pool it runs on (workers default to the CPUs available to the process)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_POOL_WORKERS: Optional[int] = None
+    PASSWORD_POOL_MAX_QUEUE: int = 64
+    # Idempotency-Key handling for order creation
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_CACHE_TTL_SECONDS: float = 3600
+    IDEMPOTENCY_WAIT_SECONDS: float = 10
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: float = 60
+    # Product ETags: how long a worker trusts its cached versions, and the Cache-Control max-age
+    ETAG_CACHE_SIZE: int = 100000
+    ETAG_CACHE_TTL_SECONDS: float = 5
+    PRODUCT_CACHE_MAX_AGE_SECONDS: int = 5
+    # Background delivery of order events from the outbox table. The daily sales
+    # rollups are only maintained by this dispatcher: with it off everywhere they freeze
+    OUTBOX_DISPATCHER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    # How often each dispatcher refreshes the backlog gauges and purges old events (None keeps them forever)
+    OUTBOX_MAINTENANCE_INTERVAL_SECONDS: float = 60
+    OUTBOX_RETENTION_HOURS: Optional[float] = 168
+    # Admission control: concurrency limit, queue length and queue wait per cost class
+    ADMISSION_CONTROL_ENABLED: bool = True
+    # Prefix matches: bcrypt runs on login and on user create/update (password hashing)
+    ADMISSION_EXPENSIVE_ROUTES: list[str] = [
+        "POST /api/v1/login/", "POST /api/v1/users/", "PUT /api/v1/users/", "POST /api/v1/orders/"
+    ]
+    ADMISSION_CONCURRENCY: dict[str, int] = {"expensive": 8, "write": 32, "read": 128}
+    ADMISSION_MAX_QUEUE: dict[str, int] = {"expensive": 32, "write": 128, "read": 512}
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: dict[str, float] = {"expensive": 1.0, "write": 2.0, "read": 5.0}
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+    ADMISSION_EXEMPT_PATHS: list[str] = ["/metrics"]
+    # Per-user token bucket (requests per second, 0 disables); anonymous callers are keyed by client address
+    USER_RATE_LIMIT_PER_SECOND: float = 0
+    USER_RATE_LIMIT_BURST: int = 20
+    # Production server (python -m app.server); workers default to the CPUs available to the process (cpuset and CFS quota)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None
+    SERVER_PRELOAD: bool = True
+    SERVER_MAX_REQUESTS: int = 10000
+    SERVER_MAX_REQUESTS_JITTER: int = 1000
+    SERVER_TIMEOUT: int = 60
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_KEEPALIVE: int = 5
+    SERVER_BACKLOG: int = 2048
 
     class Config:
         env_file = ".env"  
 
 
-settings = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class _LazySettings:
+    # Defers reading the environment and .env until a setting is first used
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+
+settings = _LazySettings()
 
 # JWT token creation
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -36,26 +114,35 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-# JWT token verification
-def verify_token(token: str, credentials_exception):
+# JWT token decoding, returns the verified claims
+def decode_token(token: str, credentials_exception) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        return UUID(user_id)
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+# JWT token verification
+def verify_token(token: str, credentials_exception):
+    payload = decode_token(token, credentials_exception)
+    try:
+        return UUID(payload["sub"])
+    except ValueError:
+        raise credentials_exception
 
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache
+def get_pwd_context() -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 #General method for verifying passwords
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
@@ -1,9 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.routes import user, login, status, order
+from app.api.routes import user, login, status, order, product, report, admin
 
 api_router = APIRouter()
 api_router.include_router(login.router, prefix="/login",tags=["login"])
 api_router.include_router(user.router, prefix="/users", tags=["users"])
 api_router.include_router(status.router, prefix="/statuses", tags=["statuses"])
 api_router.include_router(order.router, prefix="/orders", tags=["orders"])
+api_router.include_router(product.router, tags=["products"])
+api_router.include_router(report.router, prefix="/reports", tags=["reports"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
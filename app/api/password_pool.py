@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from fastapi import HTTPException, status
+from ..cpus import available_cpus
+from .auth_utlis import get_pwd_context, settings
+
+
+class PasswordPool:
+    """Runs bcrypt off the event loop on a fixed number of threads.
+
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    At most ``workers + max_queue`` jobs are admitted; anything beyond that is
+    rejected straight away with a 503 instead of queueing unboundedly.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, func, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry.",
+                headers={"Retry-After": "1"},
+            )
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - self.workers, 0),
+                "rejected": self.rejected,
+            }
+
+
+@lru_cache
+def get_pool() -> PasswordPool:
+    return PasswordPool(
+        workers=settings.PASSWORD_POOL_WORKERS or available_cpus(),
+        max_queue=settings.PASSWORD_POOL_MAX_QUEUE,
+    )
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await get_pool().run(get_pwd_context().verify, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await get_pool().run(get_pwd_context().hash, password)
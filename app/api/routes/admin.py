@@ -0,0 +1,54 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from ... import database, schemas
+from app.api import password_pool, principal_cache
+from app.api.routes import dependencies
+from app.services import exports, outbox
+
+router = APIRouter()
+
+@router.get("/db/pool", status_code=status.HTTP_200_OK)
+def get_pool_stats(admin_user: schemas.Principal = Depends(dependencies.get_current_admin)):
+    return database.get_pool_stats()
+
+@router.get("/cache/principals", status_code=status.HTTP_200_OK)
+def get_principal_cache_stats(admin_user: schemas.Principal = Depends(dependencies.get_current_admin)):
+    return principal_cache.stats()
+
+@router.get("/password-pool", status_code=status.HTTP_200_OK)
+def get_password_pool_stats(admin_user: schemas.Principal = Depends(dependencies.get_current_admin)):
+    return password_pool.get_pool().stats()
+
+@router.get("/outbox", status_code=status.HTTP_200_OK)
+def get_outbox_stats(
+    db: Session = Depends(database.get_db),
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    return outbox.get_stats(db)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# The export generators open their own session: the request's session is closed before streaming starts
+@router.get("/export/users", status_code=status.HTTP_200_OK)
+def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    return StreamingResponse(
+        exports.export_users(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+@router.get("/export/orders", status_code=status.HTTP_200_OK)
+def export_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    return StreamingResponse(
+        exports.export_orders(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="orders.{format}"'},
+    )
@@ -1,11 +1,14 @@
+import time
+from uuid import UUID
 from fastapi import Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from models import User
-from auth_utlis import verify_token, oauth2_scheme
-from database import get_db  
+from app.api.auth_utlis import decode_token, oauth2_scheme
+from app.database import get_db
+from app import schemas
+from app.api import principal_cache
 from app.services import user_service
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -14,21 +17,34 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 
 
     try:
-        user_id = verify_token(token, credentials_exception)
+        user_id = principal_cache.get_token_cache().get(token)
+        if user_id is None:
+            payload = decode_token(token, credentials_exception)
+            try:
+                user_id = UUID(payload["sub"])
+            except ValueError:
+                raise credentials_exception
+            # Never cache a token past its own expiry
+            principal_cache.get_token_cache().set(token, user_id, ttl=payload.get("exp", 0) - time.time())
 
-        user = user_service.get_user_by_id(user_id, db)
+        user = principal_cache.get_principal_cache().get(user_id)
         if user is None:
-            raise credentials_exception
+            user = user_service.get_principal(user_id, db)
+            if user is None:
+                raise credentials_exception
+            principal_cache.get_principal_cache().set(user_id, user)
 
         return user
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred: {str(e)}"
         )
 # Dependency to get current active user
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: schemas.Principal = Depends(get_current_user)) -> schemas.Principal:
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,7 +53,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 # Dependency to get current admin user
-async def get_current_admin(current_user: User = Depends(get_current_active_user)) -> User:
+async def get_current_admin(current_user: schemas.Principal = Depends(get_current_active_user)) -> schemas.Principal:
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -3,20 +3,21 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from app.services import user_service
-from auth_utlis import create_access_token, verify_password,settings
-from database import get_db
+from app.api.auth_utlis import create_access_token, settings
+from app.database import get_db_session, run_db
+from app.api.password_pool import verify_password
 import os
 
 router = APIRouter()
 
 
 @router.post("/login", status_code=status.HTTP_200_OK)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_session)
 ):
     # Fetch the user by username
-    user = user_service.get_user_by_username(form_data.username, db)
+    user = await run_db(db, user_service.get_user_by_username, form_data.username)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -25,7 +26,7 @@ def login(
         )
 
     # Verify password
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
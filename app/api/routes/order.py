@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ... import models,schemas, database
-from app.services import order_service
+from app.services import catalog_cache, idempotency, order_service
 from app.api.routes import dependencies
 
 router = APIRouter()
@@ -11,16 +11,27 @@ router = APIRouter()
 def create_order_endpoint(
     order: schemas.OrderCreateRequest, 
     db: Session = Depends(database.get_db), 
-    current_user: dict = Depends(dependencies.get_current_user)
+    current_user: schemas.Principal = Depends(dependencies.get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
-    new_order = order_service.create_order(db, current_user["id"], order)
-    return new_order
+    if idempotency_key is None:
+        new_order = order_service.create_order(db, current_user.id, order)
+        return order_service.order_summary(new_order, db)
+
+    # The order and the stored response commit together inside run_idempotent
+    def place_order():
+        new_order = order_service.create_order(db, current_user.id, order, commit=False)
+        return order_service.order_summary(new_order, db)
+
+    body = idempotency.run_idempotent(db, current_user.id, idempotency_key, order, place_order)
+    catalog_cache.versions.forget_products([line.product_id for line in order.products])
+    return body
 
 @router.get("/orders/{order_id}", response_model=schemas.OrderDetailResponse, status_code=status.HTTP_200_OK)
-def get_order_endpoint(order_id: str, db: Session = Depends(database.get_db), current_user: dict = Depends(dependencies.get_current_user)):
-    order = order_service.get_order_by_id(order_id, db)
+def get_order_endpoint(order_id: str, db: Session = Depends(database.get_db), current_user: schemas.Principal = Depends(dependencies.get_current_user)):
+    order = order_service.get_order_detail(order_id, db)
 
-    if not current_user["is_admin"] and order.user_id != current_user["id"]:
+    if not current_user.is_admin and order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You do not have permission to view this order.")
 
     return order
@@ -30,20 +41,29 @@ def update_order_status_endpoint(
     order_id: str, 
     status_request: schemas.UpdateOrderStatusRequest, 
     db: Session = Depends(database.get_db), 
-    admin_user: dict = Depends(dependencies.get_admin_user)
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
 ):
     updated_order = order_service.update_order_status(order_id, status_request.status, db)
-    return updated_order
+    return order_service.order_summary(updated_order, db)
+
+@router.post("/orders/status/bulk", response_model=schemas.BulkOrderStatusResponse, status_code=status.HTTP_200_OK)
+def bulk_update_order_status_endpoint(
+    bulk_request: schemas.BulkOrderStatusRequest,
+    db: Session = Depends(database.get_db),
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    results = order_service.bulk_update_order_status(bulk_request.order_ids, bulk_request.status, db)
+    return {"status": bulk_request.status, "results": results}
 
 @router.delete("/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 def cancel_order_endpoint(
     order_id: str, 
     db: Session = Depends(database.get_db), 
-    current_user: dict = Depends(dependencies.get_current_user)
+    current_user: schemas.Principal = Depends(dependencies.get_current_user)
 ):
     order = order_service.get_order_by_id(order_id, db)
 
-    if not current_user["is_admin"] and order.user_id != current_user["id"]:
+    if not current_user.is_admin and order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You do not have permission to cancel this order.")
 
     order_service.cancel_order(order_id, db)
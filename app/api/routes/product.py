@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ... import models, schemas, database
-from app.services import products
+from app.services import catalog_cache, pagination, product_import, products
 from app.api.routes import dependencies
-from database import get_db
-from schemas import Product,ProductUpdate,ProductCreate,ProductSearchParams
+from app.schemas import ProductSearchParams
 
 router = APIRouter()
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": catalog_cache.cache_control()},
+    )
     
 # Endpoint to create a new product
-@router.post("/products/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
+@router.post("/products/", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product_endpoint(
     product: schemas.ProductCreate, 
     db: Session = Depends(database.get_db), 
@@ -24,30 +30,94 @@ def create_product_endpoint(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+# Endpoint to bulk upsert products from a CSV or NDJSON request body
+@router.post("/products/import", status_code=status.HTTP_200_OK)
+async def import_products_endpoint(
+    request: Request,
+    db: Session = Depends(database.get_db_session),
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in product_import.CSV_TYPES | product_import.NDJSON_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send the feed as text/csv or application/x-ndjson."
+        )
+
+    async def upsert_batch(rows):
+        return await database.run_db(db, products.upsert_products, rows=rows)
+
+    return await product_import.import_products(request.stream(), content_type, upsert_batch)
+
+# Endpoint to fetch up to MAX_BATCH_IDS products in one round trip
+@router.post("/products/batch-get", response_model=schemas.ProductBatchGetResponse, status_code=status.HTTP_200_OK)
+def batch_get_products_endpoint(
+    batch: schemas.ProductBatchGetRequest,
+    db: Session = Depends(database.get_db)
+):
+    return products.get_products_by_ids(db, batch.ids)
+
+# Endpoint to search for products based on query params
+@router.get("/products/search", response_model=List[schemas.ProductResponse], status_code=status.HTTP_200_OK)
+async def search_products_endpoint(
+    filter_query: ProductSearchParams = Depends(),
+    db: Session = Depends(database.get_db_session)
+):
+    products_list = await database.run_db(
+        db,
+        products.search_products,
+        filter_query=filter_query 
+    )
+    return products_list
+
 # Endpoint to get a product by its ID
-@router.get("/products/{product_id}", response_model=schemas.Product, status_code=status.HTTP_200_OK)
+@router.get("/products/{product_id}", response_model=schemas.ProductResponse, status_code=status.HTTP_200_OK)
 def get_product_endpoint(
     product_id: str, 
+    request: Request,
+    response: Response,
     db: Session = Depends(database.get_db)
 ):
+    # Answer revalidations from the cached version without touching the database
+    if_none_match = request.headers.get("if-none-match")
+    cached_etag = catalog_cache.versions.product_etag(product_id)
+    if cached_etag and catalog_cache.etag_matches(if_none_match, cached_etag):
+        return _not_modified(cached_etag)
+
     product = products.get_product_by_id(product_id, db)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with ID {product_id} not found.")
+    etag = catalog_cache.versions.remember_product(product.id, product.version)
+    if catalog_cache.etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = catalog_cache.cache_control()
     return product
 
 # Endpoint to update product details by ID
-@router.put("/products/{product_id}", response_model=schemas.Product, status_code=status.HTTP_200_OK)
+@router.put("/products/{product_id}", response_model=schemas.ProductResponse, status_code=status.HTTP_200_OK)
 def update_product_endpoint(
     product_id: str, 
-    product_update: schemas.ProductUpdateRequest, 
+    product_update: schemas.ProductUpdate, 
     db: Session = Depends(database.get_db), 
-    admin_user: dict = Depends(dependencies.get_current_admin)
+    admin_user: dict = Depends(dependencies.get_current_admin),
+    if_match: Optional[str] = Header(None)
 ):
+    # If-Match carries the ETag the client read; the update only applies to that version
+    expected_version = None
+    if if_match:
+        try:
+            expected_version = int(if_match.strip().removeprefix("W/").strip('"').removeprefix("p"))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Malformed If-Match header.")
     try:
-        updated_product = products.update_product(product_id, product_update, db)
+        updated_product = products.update_product(product_id, product_update, db, expected_version=expected_version)
         if not updated_product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with ID {product_id} not found.")
         return updated_product
+    except HTTPException:
+        raise
     except ValueError:
         raise HTTPException(status_code=404, detail="Bad request")
     except Exception as e:
@@ -67,22 +137,19 @@ def delete_product_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint to list all products
-@router.get("/products", response_model=List[schemas.Product], status_code=status.HTTP_200_OK)
+@router.get("/products", response_model=schemas.ProductPage, status_code=status.HTTP_200_OK)
 def list_products_endpoint(
+    request: Request,
+    response: Response,
     db: Session = Depends(database.get_db),
-    page: int = 1,  # Default page is 1
-    page_size: int = 10  # Default page size is 10
+    cursor: Optional[str] = None,  # Opaque cursor from the previous page's next_cursor
+    page_size: int = Query(10, ge=1, le=pagination.MAX_PAGE_SIZE)
 ):
-    products_list = products.list_products(db, page=page, page_size=page_size)
-    return products_list
-# Endpoint to search for products based on query params
-@router.get("/products/search", response_model=List[schemas.ProductResponse], status_code=status.HTTP_200_OK)
-async def search_products_endpoint(
-    filter_query: ProductSearchParams = Depends(),
-    db: Session = Depends(database.get_db)
-):
-    products_list = products.search_products(
-        db,
-        filter_query=filter_query 
-    )
+    etag = catalog_cache.versions.list_etag(db, cursor, page_size)
+    if catalog_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+
+    products_list = products.list_products(db, cursor=cursor, page_size=page_size)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = catalog_cache.cache_control()
     return products_list
\ No newline at end of file
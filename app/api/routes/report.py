@@ -0,0 +1,45 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from ... import schemas, database
+from app.services import rollups
+from app.api.routes import dependencies
+
+router = APIRouter()
+
+MAX_RANGE_DAYS = 366
+
+
+def _date_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end.")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Range is limited to {MAX_RANGE_DAYS} days.")
+    return start, end
+
+# Daily units and revenue per product, canceled orders excluded
+@router.get("/sales/products", response_model=list[schemas.ProductSalesDay], status_code=status.HTTP_200_OK)
+def product_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    product_id: Optional[UUID] = None,
+    db: Session = Depends(database.get_db),
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    start, end = _date_range(start, end)
+    return rollups.get_product_sales(db, start, end, product_id)
+
+# Daily order count and revenue per current order status
+@router.get("/sales/statuses", response_model=list[schemas.StatusSalesDay], status_code=status.HTTP_200_OK)
+def status_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+    admin_user: schemas.Principal = Depends(dependencies.get_current_admin)
+):
+    start, end = _date_range(start, end)
+    return rollups.get_status_sales(db, start, end)
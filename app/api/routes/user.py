@@ -1,33 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import UUID
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from uuid import UUID
 from sqlalchemy.orm import Session
+from app.api import password_pool
 from app.api.routes import dependencies
-from app.services import user_service, order_service
+from app.services import user_service, order_service, pagination
 from ... import models,schemas, database
 
 router = APIRouter()
 
 @router.post("/users/", response_model=schemas.UserCreateResponseModel, status_code=status.HTTP_201_CREATED)
-def create_user(user: schemas.UserCreateRequestModel, db: Session = Depends(database.get_db)):
-   return user_service.create_user(db=db,user=user)  
+async def create_user(user: schemas.UserCreateRequestModel, db: Session = Depends(database.get_db_session)):
+   # Hash on the password pool first, so neither the event loop nor a pooled connection waits on bcrypt
+   hashed_password = await password_pool.get_password_hash(user.password)
+   return await database.run_db(db, user_service.create_user, user=user, hashed_password=hashed_password)
 
 
 @router.get("/users/{user_id}", response_model=schemas.GetUserResponseModel, status_code=status.HTTP_200_OK)
 async def get_user_details(
     user_id: UUID, 
-    db: Session = Depends(database.get_db), 
+    db: Session = Depends(database.get_db_session), 
     current_user: models.User = Depends(dependencies.get_current_user)
 ):
 
-    if not current_user.is_admin and current_user.id != user.id:
+    if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Access denied."
         )
         
-    user = user_service.get_user_by_id(user_id, db)
+    user = await database.run_db(db, user_service.get_user_by_id, user_id)
 
-    return schemas.GetUserResponseModel(user)
+    return schemas.GetUserResponseModel.model_validate(user)
 
     
 
@@ -35,7 +39,7 @@ async def get_user_details(
 async def update_user(
     user_id: UUID,
     update_data: schemas.UserUpdateRequestModel,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_db_session),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
 
@@ -46,15 +50,18 @@ async def update_user(
             detail="You are not authorized to update this user."
         )
 
-    updated_user = user_service.update_user_in_db(user_id, update_data, db)
+    hashed_password = await password_pool.get_password_hash(update_data.password) if update_data.password else None
+    updated_user = await database.run_db(
+        db, user_service.update_user_in_db, user_id, update_data, hashed_password=hashed_password
+    )
 
-    return schemas.UserUpdateResponseModel(updated_user)
+    return schemas.UserUpdateResponseModel.model_validate(updated_user)
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_200_OK)
 async def delete_user(
     user_id: UUID,
-    db: Session = Depends(database.get_db),
+    db: Session = Depends(database.get_db_session),
     current_user: models.User = Depends(dependencies.get_current_active_user)
 ):
     # Ensure users can only delete their own account
@@ -64,31 +71,37 @@ async def delete_user(
             detail="You are not authorized to delete this user."
         )
 
-    user_service.delete_user_from_db(user_id, db)
+    await database.run_db(db, user_service.delete_user_from_db, user_id)
 
     return {"message": f"User with ID {user_id} has been successfully deleted."}
 
 
 
-@router.get("/users", response_model=list[schemas.GetUserResponseModel], status_code=status.HTTP_200_OK)
+@router.get("/users", response_model=schemas.UserPage, status_code=status.HTTP_200_OK)
 def get_users(
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_admin)  
+    current_user: models.User = Depends(dependencies.get_current_admin),
+    cursor: Optional[str] = None,
+    page_size: int = Query(10, ge=1, le=pagination.MAX_PAGE_SIZE)
 ):
     try:
-        users = user_service.get_all_users(db)
+        users = user_service.get_all_users(db, cursor=cursor, page_size=page_size)
         return users
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while retrieving users."
         )
     
-@router.get("/users/{user_id}/orders", response_model=list[schemas.OrderDetailResponse], status_code=status.HTTP_200_OK)
+@router.get("/users/{user_id}/orders", response_model=schemas.OrderPage, status_code=status.HTTP_200_OK)
 def list_orders_for_user(
     user_id: UUID,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(dependencies.get_current_active_user)
+    current_user: models.User = Depends(dependencies.get_current_active_user),
+    cursor: Optional[str] = None,
+    page_size: int = Query(10, ge=1, le=pagination.MAX_PAGE_SIZE)
 ):
     if user_id != current_user.id and not current_user.is_admin:
         raise HTTPException(
@@ -96,7 +109,7 @@ def list_orders_for_user(
             detail="You are not authorized to view these orders."
         )
 
-    orders = order_service.get_orders_for_user(str(user_id), db)
+    orders = order_service.get_orders_for_user(str(user_id), db, cursor=cursor, page_size=page_size)
     return orders
 
 
@@ -0,0 +1,50 @@
+"""CPUs this process may actually use, for sizing worker processes and pools.
+
+``os.cpu_count()`` reports the host's cores. Containers are limited in two
+ways: a cpuset, which shows up in ``sched_getaffinity``, and a CFS quota
+(``docker --cpus``, Kubernetes CPU limits), which only shows up in the cgroup
+files. ``available_cpus`` takes the smaller of the two.
+"""
+import math
+import os
+from typing import Optional
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> Optional[int]:
+    """CPUs allowed by the CFS quota, rounded up, or None when unlimited."""
+    quota = period = None
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        # "<quota> <period>", with "max" for no limit
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota, period = _read(CGROUP_V1_QUOTA), _read(CGROUP_V1_PERIOD)
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        return None
+    if quota <= 0 or period <= 0:
+        # v1 reports -1 for no limit
+        return None
+    return max(math.ceil(quota / period), 1)
+
+
+def available_cpus() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit is not None else cpus
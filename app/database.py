@@ -1,21 +1,196 @@
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
+from .api.auth_utlis import settings
+from .pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_pool
 
 
 
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+def get_pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_use_lifo": settings.DB_POOL_USE_LIFO,
+    }
 
-engine = create_engine(DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines are built on first use so importing the app never touches settings or the network
+@lru_cache
+def get_engine() -> Engine:
+    engine = create_engine(settings.DATABASE_URL, poolclass=InstrumentedQueuePool, **get_pool_options())
+    instrument_pool(engine.pool)
+    return engine
+
+
+def get_async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    # Reuse the sync URL with the asyncpg driver
+    return settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1).replace(
+        "postgresql+psycopg2://", "postgresql+asyncpg://", 1
+    )
+
+
+@lru_cache
+def get_async_engine() -> Optional[AsyncEngine]:
+    if not settings.DB_ASYNC:
+        return None
+    async_engine = create_async_engine(get_async_database_url(), poolclass=InstrumentedAsyncQueuePool, **get_pool_options())
+    instrument_pool(async_engine.sync_engine.pool)
+    return async_engine
+
+
+class _LazySessionMaker(sessionmaker):
+    # Binds to the engine the first time a session is created
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionMaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+
+@lru_cache
+def get_async_sessionmaker() -> Optional[async_sessionmaker]:
+    async_engine = get_async_engine()
+    if async_engine is None:
+        return None
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def __getattr__(name: str):
+    # Keep database.engine / database.async_engine / database.DATABASE_URL working, lazily
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "DATABASE_URL":
+        return settings.DATABASE_URL
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def dispose_engines() -> None:
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+
+
+async def dispose_async_engine() -> None:
+    if get_async_engine.cache_info().currsize and get_async_engine() is not None:
+        await get_async_engine().dispose()
+
+
+def get_pool_stats() -> dict:
+    engine = get_engine()
+    stats = {"sync": engine.pool.metrics.snapshot(engine.pool)}
+    async_engine = get_async_engine()
+    if async_engine is not None:
+        pool = async_engine.sync_engine.pool
+        stats["async"] = pool.metrics.snapshot(pool)
+    return stats
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    session_factory = get_async_sessionmaker()
+    if session_factory is None:
+        raise RuntimeError("Async database mode is disabled. Set DB_ASYNC=true to enable it.")
+    async with session_factory() as db:
+        yield db
+
+# Session dependency for async routes: AsyncSession when DB_ASYNC is set, otherwise a sync Session
+async def get_db_session():
+    if settings.DB_ASYNC:
+        async for db in get_async_db():
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def run_db(db: Session | AsyncSession, func, *args, **kwargs):
+    """Run a sync service function without blocking the event loop.
+
+    Services take the session as their ``db`` argument. With an AsyncSession the
+    call runs through ``run_sync`` on the async driver; with a sync Session it is
+    moved to the thread pool.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: func(*args, db=session, **kwargs))
+    return await run_in_threadpool(func, *args, db=db, **kwargs)
+
+
+class RepeatedQueryWarning(UserWarning):
+    """The same statement ran more than N_PLUS_ONE_THRESHOLD times in one request.
+
+    Turn it into an error in tests with ``-W error::app.database.RepeatedQueryWarning``.
+    """
+
+
+class QueryStats:
+    """Statements issued while a request (or a ``track_queries`` block) is active."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(statement, count) for statement, count in self.shapes.most_common() if count > threshold]
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries():
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+# Registered on the Engine class so the sync, async and any test engines are all covered.
+# The start time lives on the execution context, which is discarded with the
+# statement, so statements that raise (and never reach after_cursor_execute)
+# leave nothing behind on the pooled connection.
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_start_time = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    start = context._query_start_time
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - start)
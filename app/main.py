@@ -1,13 +1,62 @@
+import logging
+from contextlib import asynccontextmanager
+from datetime import timedelta
 from fastapi import FastAPI
-from .database import engine
-from . import models
-from .api.routes import *
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from . import database, metrics
+from .middleware import AdmissionControlMiddleware, MetricsMiddleware, QueryAccountingMiddleware, counting_http_exception_handler
+from app.api.auth_utlis import settings
 from app.api.main import api_router
+from app.services import outbox, rollups  # noqa: F401 - rollups registers its outbox handler
+from app.services.status_registry import registry as status_registry
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
 
+def warm_status_registry():
+    with database.SessionLocal() as db:
+        status_registry.load(db)
 
 
-app.include_router(api_router, prefix="/api/v1")
\ No newline at end of file
+# Schema changes are not made here: run `python -m app.migrate` before starting workers
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await run_in_threadpool(warm_status_registry)
+    except Exception:
+        # Serve anyway; the registry loads on first use once the database is reachable
+        logger.warning("Could not preload order statuses", exc_info=True)
+    dispatcher = None
+    if settings.OUTBOX_DISPATCHER_ENABLED:
+        retention = settings.OUTBOX_RETENTION_HOURS
+        dispatcher = outbox.OutboxDispatcher(
+            database.SessionLocal,
+            settings.OUTBOX_BATCH_SIZE,
+            settings.OUTBOX_POLL_INTERVAL_SECONDS,
+            maintenance_interval=settings.OUTBOX_MAINTENANCE_INTERVAL_SECONDS,
+            retention=timedelta(hours=retention) if retention is not None else None,
+        )
+        dispatcher.start()
+    yield
+    if dispatcher is not None:
+        await run_in_threadpool(dispatcher.stop)
+    await database.dispose_async_engine()
+    database.dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(QueryAccountingMiddleware)
+# Inside MetricsMiddleware, so shed requests still show up in the latency histograms
+app.add_middleware(AdmissionControlMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_exception_handler(StarletteHTTPException, counting_http_exception_handler)
+
+
+app.include_router(api_router, prefix="/api/v1")
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,169 @@
+"""In-process metrics rendered in the Prometheus text exposition format."""
+import bisect
+import threading
+from typing import Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, *labels, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = self.header()
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector) -> None:
+        """``collector()`` is called at scrape time to refresh gauges that are sampled, not tracked."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"))
+)
+REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being served.", ("method",))
+)
+HTTP_EXCEPTIONS = registry.register(
+    Counter("http_exceptions_total", "HTTPExceptions raised by routes and services.", ("method", "route", "status"))
+)
+DB_QUERIES_PER_REQUEST = registry.register(
+    Histogram("http_request_db_queries", "SQL statements issued per HTTP request.", ("method", "route"), buckets=(1, 2, 5, 10, 20, 50, 100))
+)
+DB_TIME_PER_REQUEST = registry.register(
+    Histogram("http_request_db_seconds", "Time spent in SQL statements per HTTP request.", ("method", "route"))
+)
+OUTBOX_DISPATCHED = registry.register(
+    Counter("outbox_events_dispatched_total", "Outbox events delivered to their handlers.", ("event_type",))
+)
+OUTBOX_FAILURES = registry.register(
+    Counter("outbox_event_failures_total", "Failed outbox delivery attempts.", ("event_type",))
+)
+OUTBOX_PENDING = registry.register(
+    Gauge("outbox_events_pending", "Outbox events waiting for delivery.")
+)
+OUTBOX_LAG = registry.register(
+    Gauge("outbox_oldest_pending_age_seconds", "Age of the oldest undelivered outbox event.")
+)
+ADMISSION_IN_FLIGHT = registry.register(
+    Gauge("admission_in_flight", "Requests holding an admission slot.", ("cost_class",))
+)
+ADMISSION_QUEUE_DEPTH = registry.register(
+    Gauge("admission_queue_depth", "Requests waiting for an admission slot.", ("cost_class",))
+)
+ADMISSION_WAIT = registry.register(
+    Histogram("admission_wait_seconds", "Time spent waiting for an admission slot.", ("cost_class",))
+)
+ADMISSION_REJECTIONS = registry.register(
+    Counter("admission_rejections_total", "Requests shed by admission control.", ("cost_class", "reason"))
+)
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import time
+import warnings
+from fastapi import Request
+from fastapi.exception_handlers import http_exception_handler
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from . import database, metrics
+from .api.auth_utlis import decode_token, settings
+from .api.principal_cache import TTLCache, get_token_cache
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_path(scope: Scope) -> str:
+    # The route template, not the raw path, keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """Records per-route latency histograms and in-flight gauges.
+
+    Written as plain ASGI rather than BaseHTTPMiddleware to keep per-request
+    overhead to a couple of dict updates.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec(method)
+            metrics.REQUEST_LATENCY.observe(method, route_path(scope), status_code, value=time.perf_counter() - start)
+
+
+class QueryAccountingMiddleware:
+    """Attributes every SQL statement to the request that issued it.
+
+    Feeds the per-request query count and DB time histograms, adds
+    X-DB-Queries / X-DB-Time headers when DEBUG is on, and raises a
+    RepeatedQueryWarning when one statement shape repeats more than
+    N_PLUS_ONE_THRESHOLD times, which is the signature of an N+1 loop.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with database.track_queries() as stats:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start" and settings.DEBUG:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-db-queries", str(stats.count).encode()),
+                        (b"x-db-time", f"{stats.duration * 1000:.2f}ms".encode()),
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        route = route_path(scope)
+        metrics.DB_QUERIES_PER_REQUEST.observe(scope["method"], route, value=stats.count)
+        metrics.DB_TIME_PER_REQUEST.observe(scope["method"], route, value=stats.duration)
+
+        if settings.N_PLUS_ONE_THRESHOLD > 0:
+            for statement, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+                message = f"{scope['method']} {route} ran the same statement {count} times: {statement[:200]}"
+                logger.warning(message)
+                warnings.warn(message, database.RepeatedQueryWarning, stacklevel=2)
+
+
+class _CostClass:
+    """Concurrency limit with a bounded, time-limited wait queue."""
+
+    def __init__(self, name: str, limit: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+
+    async def acquire(self) -> str | None:
+        """Take a slot; returns the rejection reason instead if none is free in time."""
+        if self.semaphore.locked():
+            if self.waiting >= self.max_queue:
+                return "queue_full"
+            self.waiting += 1
+            metrics.ADMISSION_QUEUE_DEPTH.inc(self.name)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                return "timeout"
+            finally:
+                self.waiting -= 1
+                metrics.ADMISSION_QUEUE_DEPTH.dec(self.name)
+            metrics.ADMISSION_WAIT.observe(self.name, value=time.perf_counter() - start)
+        else:
+            await self.semaphore.acquire()
+            metrics.ADMISSION_WAIT.observe(self.name, value=0.0)
+        metrics.ADMISSION_IN_FLIGHT.inc(self.name)
+        return None
+
+    def release(self) -> None:
+        metrics.ADMISSION_IN_FLIGHT.dec(self.name)
+        self.semaphore.release()
+
+
+class _TokenBuckets:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        # Idle buckets are full again after burst / rate seconds, so they can be dropped then
+        self._buckets = TTLCache(100000, max(burst / rate, 1.0))
+
+    def take(self, key) -> float:
+        """Spend one token for ``key``; returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key) or (self.burst, now)
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets.set(key, (tokens, now))
+            return (1 - tokens) / self.rate
+        self._buckets.set(key, (tokens - 1, now))
+        return 0.0
+
+
+class AdmissionControlMiddleware:
+    """Sheds load before it reaches the routes.
+
+    Each request is assigned a cost class: ``expensive`` for the routes in
+    ADMISSION_EXPENSIVE_ROUTES (bcrypt logins and password writes, checkout),
+    otherwise ``write`` or ``read`` by method. Every class has its own concurrency limit, so a
+    flood of logins queues behind its own slots instead of starving cheap
+    reads. A request that finds the queue full, or waits longer than the
+    class timeout, gets 503 with Retry-After. With USER_RATE_LIMIT_PER_SECOND
+    set, each caller also spends from a token bucket and gets 429 when empty.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.enabled = settings.ADMISSION_CONTROL_ENABLED
+        self.expensive_routes = [
+            tuple(rule.split(" ", 1)) for rule in settings.ADMISSION_EXPENSIVE_ROUTES
+        ]
+        self.classes = {
+            name: _CostClass(
+                name,
+                limit,
+                settings.ADMISSION_MAX_QUEUE.get(name, 0),
+                settings.ADMISSION_QUEUE_TIMEOUT_SECONDS.get(name, 0),
+            )
+            for name, limit in settings.ADMISSION_CONCURRENCY.items()
+        }
+        self.buckets = (
+            _TokenBuckets(settings.USER_RATE_LIMIT_PER_SECOND, settings.USER_RATE_LIMIT_BURST)
+            if settings.USER_RATE_LIMIT_PER_SECOND > 0
+            else None
+        )
+
+    def cost_class(self, scope: Scope) -> str:
+        method, path = scope["method"], scope["path"]
+        for rule_method, prefix in self.expensive_routes:
+            if method == rule_method and path.startswith(prefix):
+                return "expensive"
+        return "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+
+    def caller(self, scope: Scope):
+        for name, value in scope.get("headers", []):
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                token = value[7:].decode("latin-1")
+                # Always a str, so a cached and a freshly decoded token share one bucket
+                user_id = get_token_cache().get(token)
+                if user_id is not None:
+                    return str(user_id)
+                try:
+                    return str(decode_token(token, ValueError())["sub"])
+                except ValueError:
+                    break
+        client = scope.get("client")
+        return client[0] if client else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled or scope["path"] in settings.ADMISSION_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        cost_class = self.classes.get(self.cost_class(scope))
+        if cost_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.buckets is not None:
+            wait = self.buckets.take(self.caller(scope))
+            if wait:
+                metrics.ADMISSION_REJECTIONS.inc(cost_class.name, "rate_limited")
+                await self.reject(send, 429, "Too many requests.", max(1, round(wait)))
+                return
+
+        reason = await cost_class.acquire()
+        if reason is not None:
+            metrics.ADMISSION_REJECTIONS.inc(cost_class.name, reason)
+            await self.reject(send, 503, "Server is busy, retry shortly.", settings.ADMISSION_RETRY_AFTER_SECONDS)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cost_class.release()
+
+    @staticmethod
+    async def reject(send: Send, status_code: int, detail: str, retry_after: int) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def counting_http_exception_handler(request: Request, exc: StarletteHTTPException):
+    metrics.HTTP_EXCEPTIONS.inc(request.method, route_path(request.scope), exc.status_code)
+    return await http_exception_handler(request, exc)
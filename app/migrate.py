@@ -0,0 +1,84 @@
+"""Create or update the database schema.
+
+Run once per deploy, before the API workers start:
+
+    python -m app.migrate
+
+``create_all`` only creates missing tables. Columns added to a model after its
+table shipped are listed in ``COLUMN_MIGRATIONS`` and added (and backfilled)
+here; indexes added later are created separately, ``CONCURRENTLY`` so they do
+not block writes on large tables. A concurrent build that failed leaves an
+INVALID index behind; those are dropped and built again. Every step is
+idempotent.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from . import models
+from .database import get_engine
+
+# (table, column definition, backfill or None), applied in order
+COLUMN_MIGRATIONS = [
+    ("products", "created_at TIMESTAMP WITH TIME ZONE", "UPDATE products SET created_at = now() WHERE created_at IS NULL"),
+    ("products", "updated_at TIMESTAMP WITH TIME ZONE", None),
+    # The volatile default numbers every existing row as the column is added
+    ("products", "version BIGINT NOT NULL DEFAULT nextval('catalog_version_seq')", None),
+    ("order_product", "unit_price NUMERIC(10, 2)", None),
+    # Keyset pagination seeks on (created_at, id); rows with a null created_at would never be reached
+    ("users", "created_at TIMESTAMP WITH TIME ZONE", "UPDATE users SET created_at = now() WHERE created_at IS NULL"),
+    ("orders", "created_at TIMESTAMP WITH TIME ZONE", "UPDATE orders SET created_at = now() WHERE created_at IS NULL"),
+]
+
+
+def add_missing_columns(engine) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE SEQUENCE IF NOT EXISTS catalog_version_seq")
+        for table, column, backfill in COLUMN_MIGRATIONS:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}")
+            if backfill:
+                conn.exec_driver_sql(backfill)
+
+
+def create_missing_indexes(engine) -> list[str]:
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "postgresql":
+            # Normally installed when products is created; needed here for its trigram indexes
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        invalid = set()
+        if engine.dialect.name == "postgresql":
+            invalid = set(conn.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE NOT i.indisvalid AND c.relnamespace = current_schema()::regnamespace"
+            )).scalars())
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name in invalid:
+                    # IF NOT EXISTS would keep the broken index forever
+                    conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"')
+                elif index.name in existing:
+                    continue
+                ddl = str(CreateIndex(index).compile(dialect=engine.dialect))
+                if engine.dialect.name == "postgresql":
+                    ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY IF NOT EXISTS", 1)
+                    ddl = ddl.replace("CREATE UNIQUE INDEX", "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS", 1)
+                conn.exec_driver_sql(ddl)
+                created.append(index.name)
+    return created
+
+
+def migrate() -> None:
+    engine = get_engine()
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    create_missing_indexes(engine)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,12 +1,14 @@
 from datetime import datetime, timezone
 import uuid
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, Numeric, String, Text, func
+from sqlalchemy import DDL, BigInteger, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, JSON, Numeric, Sequence, String, Text, event, func, text
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .database import Base
+from .ids import uuid7
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(uuid(as_uuid=True), primary_key=True, default=uuid, unique=True, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, index=True)
     username = Column(String(50), nullable=False, unique=True, index=True)
     email = Column(String(100), nullable=False, unique=True, index=True)
     hashed_password = Column(String(255), nullable=False)
@@ -18,26 +20,64 @@ class User(Base):
 
     orders = relationship("Order", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+
+
+# Every product write, stock changes included, takes the next value as the product's version
+catalog_version_seq = Sequence("catalog_version_seq")
+
+
+class CatalogVersion(Base):
+    """Single row versioning what the product list shows.
+
+    Bumped inside the transaction of every write that changes a listed field,
+    so readers only ever see versions of committed catalogs.
+    """
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 
 class Product(Base):
     __tablename__ = "products"
-    id = Column(uuid.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7, unique=True, nullable=False)
     name = Column(String(255), unique=True, nullable=False)
     description = Column(Text, nullable=True)
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False)
     is_available = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    version = Column(BigInteger, catalog_version_seq, server_default=catalog_version_seq.next_value(), nullable=False)
 
 
     order_products = relationship("OrderProduct", back_populates="product", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Trigram indexes serve the ILIKE '%term%' matching in product search
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index("ix_products_description_trgm", "description", postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}),
+        Index("ix_products_is_available_price", "is_available", "price"),
+        Index("ix_products_created_at_id", "created_at", "id"),
+    )
+
+
+event.listen(
+    Product.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class Order(Base):
     __tablename__ = "orders"
 
-    id = Column(uuid.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, index=True)
-    user_id = Column(uuid.UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
-    status_id = Column(uuid.UUID(as_uuid=True), ForeignKey("order_status.id", ondelete="SET NULL"), nullable=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7, unique=True, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    status_id = Column(UUID(as_uuid=True), ForeignKey("order_status.id", ondelete="SET NULL"), nullable=True)
     total_price = Column(Numeric(10, 2), nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), onupdate=datetime.now(timezone.utc))
@@ -46,11 +86,18 @@ class Order(Base):
     status = relationship("OrderStatus", back_populates="orders")
     products = relationship("OrderProduct", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination of a user's order history
+        Index("ix_orders_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Orders in a given status: status deletion checks and bulk status changes
+        Index("ix_orders_status_id", "status_id"),
+    )
+
 
 class OrderStatus(Base):
     __tablename__ = "order_status"
 
-    id = Column(uuid.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7, unique=True, index=True)
     name = Column(String(50), unique=True, nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), onupdate=datetime.now(timezone.utc))
@@ -61,12 +108,71 @@ class OrderStatus(Base):
 class OrderProduct(Base):
     __tablename__ = "order_product"
 
-    id = Column(uuid.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, index=True)
-    order_id = Column(uuid.UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
-    product_id = Column(uuid.UUID(as_uuid=True), ForeignKey("products.id", ondelete="SET NULL"), nullable=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7, unique=True, index=True)
+    order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="SET NULL"), nullable=True)
     quantity = Column(Integer, nullable=False)
+    # Price at checkout; null for lines created before it was recorded
+    unit_price = Column(Numeric(10, 2), nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(DateTime(timezone=True), onupdate=datetime.now(timezone.utc))
 
     order = relationship("Order", back_populates="products")
     product = relationship("Product", back_populates="order_products")
+
+    __table_args__ = (
+        # Line items of an order, and the FK lookups done when an order or product is deleted
+        Index("ix_order_product_order_id", "order_id"),
+        Index("ix_order_product_product_id", "product_id"),
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    # Null while the first request is still being processed
+    response_body = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# Reporting rollups, keyed by the UTC day the order was placed
+class DailyProductSales(Base):
+    __tablename__ = "daily_product_sales"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(UUID(as_uuid=True), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class DailyStatusSales(Base):
+    __tablename__ = "daily_status_sales"
+
+    day = Column(Date, primary_key=True)
+    status_id = Column(UUID(as_uuid=True), primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+
+
+class OutboxEvent(Base):
+    """Order lifecycle event, written in the same transaction as the change it describes."""
+    __tablename__ = "outbox_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_type = Column(String(100), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    available_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    failed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Only undelivered events are ever polled, so keep the index to those
+        Index("ix_outbox_events_pending", "available_at", "id", postgresql_where=text("processed_at IS NULL AND failed_at IS NULL")),
+    )
\ No newline at end of file
@@ -0,0 +1,135 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """Counters for a single connection pool, updated from pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.overflow_checkouts = 0
+        self.max_overflow_seen = 0
+
+    def increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_time_total += seconds
+            self.wait_time_max = max(self.wait_time_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def record_checkout(self, overflow: int):
+        with self._lock:
+            self.checkouts += 1
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.max_overflow_seen = max(self.max_overflow_seen, overflow)
+
+    def snapshot(self, pool) -> dict:
+        now = time.monotonic()
+        ages = [now - created for created in list(pool.instruments.connection_created.values())]
+        with self._lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "pool_class": type(pool).__name__,
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                # Every wait ends in a checkout or a timeout
+                "wait_time_avg_ms": (self.wait_time_total / waits * 1000) if waits else 0.0,
+                "wait_time_max_ms": self.wait_time_max * 1000,
+                "overflow_checkouts": self.overflow_checkouts,
+                "max_overflow_seen": self.max_overflow_seen,
+                "connection_age_max_s": max(ages) if ages else 0.0,
+                "connection_age_avg_s": (sum(ages) / len(ages)) if ages else 0.0,
+            }
+
+
+class PoolInstruments:
+    """Metrics plus the creation time of every live connection, keyed by connection record."""
+
+    def __init__(self):
+        self.metrics = PoolMetrics()
+        self.connection_created: dict = {}
+
+
+class _InstrumentedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instruments = PoolInstruments()
+
+    @property
+    def metrics(self) -> PoolMetrics:
+        return self.instruments.metrics
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool built here; it inherits the event
+        # listeners, so hand it the same instruments and forget the old connections
+        pool = super().recreate()
+        pool.instruments = self.instruments
+        self.instruments.connection_created.clear()
+        return pool
+
+    # Time spent waiting for a connection is only visible from inside the pool
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        self.metrics.record_checkout(self.overflow())
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(pool):
+    # The listeners outlive this pool object (see recreate), so they close over
+    # the shared instruments rather than the pool
+    instruments = pool.instruments
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        instruments.metrics.increment("connects")
+        instruments.connection_created[id(connection_record)] = time.monotonic()
+
+    @event.listens_for(pool, "close")
+    def on_close(dbapi_connection, connection_record):
+        instruments.connection_created.pop(id(connection_record), None)
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        instruments.metrics.increment("invalidations")
+        instruments.connection_created.pop(id(connection_record), None)
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        instruments.metrics.increment("checkins")
+
+    return pool
@@ -1,6 +1,6 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID, uuid4
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from pydantic import BaseModel, EmailStr, Field, condecimal, PositiveInt
 from enum import Enum
 
@@ -89,8 +89,8 @@ class UserUpdateResponseModel(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc),description="User creation timestamp.")
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc),description="Last updated timestamp.")
 
-    class config:
-        orm_mode = True
+    class Config:
+        from_attributes = True
 
 class ChangeRoleRequest(BaseModel):
     user_id: UUID
@@ -104,7 +104,16 @@ class GetUserResponseModel(BaseModel):
     is_admin: bool
     is_active: bool
     created_at: datetime
-    updated_at: datetime
+    # Null until the first update
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class UserPage(BaseModel):
+    items: List[GetUserResponseModel]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page.")
 
 
 
@@ -115,7 +124,7 @@ class ProductOrder(BaseModel):
     quantity: int = Field(..., ge=1, description="The quantity of the product being ordered.")
 
 class OrderCreateRequest(BaseModel):
-    products: List[ProductOrder] = Field(..., description="List of products to order.")
+    products: List[ProductOrder] = Field(..., min_length=1, description="List of products to order.")
 
 class OrderCreateResponse(BaseModel):
     id: UUID
@@ -128,25 +137,51 @@ class OrderCreateResponse(BaseModel):
         orm_mode = True
     
 
+class OrderLineResponse(BaseModel):
+    product_id: Optional[UUID] = Field(None, description="The ordered product, null if it has since been deleted.")
+    quantity: int
+
 class OrderDetailResponse(BaseModel):
     id: UUID
-    user_id: UUID
+    # Null once the ordering user has been deleted
+    user_id: Optional[UUID] = None
     status: str
     total_price: float
     created_at: datetime
-    updated_at: datetime
-    products: List[ProductOrder]
+    updated_at: Optional[datetime] = None
+    products: List[OrderLineResponse]
     
     class config:
         orm_mode = True
 
 
+class OrderPage(BaseModel):
+    items: List[OrderDetailResponse]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page.")
+
+
 class UpdateOrderStatusRequest(BaseModel):
     status: str = Field(..., description="New status of the order", pattern="^(pending|processing|completed|canceled)$")
 
+MAX_BATCH_IDS = 500
+
+class BulkOrderStatusRequest(BaseModel):
+    order_ids: List[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_IDS, description="Orders to move to the new status.")
+    status: str = Field(..., description="New status of the orders", pattern="^(pending|processing|completed|canceled)$")
+
+class BulkOrderStatusResult(BaseModel):
+    order_id: UUID
+    result: Literal["updated", "unchanged", "rejected", "not_found"]
+    previous_status: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkOrderStatusResponse(BaseModel):
+    status: str
+    results: List[BulkOrderStatusResult]
+
 class OrderUpdateResponse(BaseModel):
     id: UUID
-    user_id: UUID
+    user_id: Optional[UUID] = None
     status: str
     total_price: float
     created_at: datetime
@@ -202,6 +237,42 @@ class ProductCreate(BaseModel):
     stock: int = Field(..., ge=0, description="The available stock of the product.")
     is_available: bool = Field(True, description="Is the product available for sale?") 
 
+class ProductResponse(BaseModel):
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    price: float
+    stock: int
+    is_available: bool
+    created_at: Optional[datetime] = None
+    version: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# The list omits stock and version, so checkouts do not change it (or its ETag)
+class ProductListItem(BaseModel):
+    id: UUID
+    name: str
+    description: Optional[str] = None
+    price: float
+    is_available: bool
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ProductPage(BaseModel):
+    items: List[ProductListItem]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to fetch the next page.")
+
+class ProductBatchGetRequest(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=MAX_BATCH_IDS, description="Product IDs to fetch.")
+
+class ProductBatchGetResponse(BaseModel):
+    items: List[ProductResponse] = Field(..., description="Found products, in request order.")
+    missing: List[UUID] = Field(default_factory=list, description="Requested IDs that do not exist.")
+
 class ProductUpdate(BaseModel):
     name: Optional[str] = Field(None, description="Name of the product.")
     price: Optional[condecimal(gt=0, decimal_places=2)] = Field(None, gt=0, description="Price of the product. Must be a positive decimal.")
@@ -239,10 +310,36 @@ class StatusUpdate(BaseModel):
 
 
 
+class ProductSalesDay(BaseModel):
+    day: date
+    product_id: UUID
+    quantity: int
+    revenue: float
+
+    class Config:
+        from_attributes = True
+
+class StatusSalesDay(BaseModel):
+    day: date
+    status: Optional[str]
+    order_count: int
+    revenue: float
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 
+class Principal(BaseModel):
+    """The authenticated caller, as much of the user as authorization needs."""
+    id: UUID
+    is_active: bool
+    is_admin: bool
+
+    class Config:
+        from_attributes = True
+
+
 class TokenData(BaseModel):
     user_id: Optional[UUID] = None
@@ -0,0 +1,69 @@
+"""Multi-worker production server: gunicorn managing uvicorn workers.
+
+    python -m app.server
+
+Every option comes from Settings (SERVER_*). Each worker is a separate
+process with its own connection pool, so the database sees up to
+SERVER_WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+"""
+import os
+from gunicorn.app.base import BaseApplication
+from .api.auth_utlis import settings
+from .cpus import available_cpus
+from .database import get_engine
+
+
+def default_workers() -> int:
+    # The container's CPU set and CFS quota, not the host's core count
+    return available_cpus()
+
+
+def post_fork(server, worker) -> None:
+    # Never share pooled connections opened in the master with a worker
+    if get_engine.cache_info().currsize:
+        get_engine().dispose(close=False)
+
+
+def gunicorn_options() -> dict:
+    return {
+        "bind": f"{settings.SERVER_HOST}:{settings.SERVER_PORT}",
+        "workers": settings.SERVER_WORKERS or default_workers(),
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": settings.SERVER_PRELOAD,
+        # Recycle workers periodically to contain leaks; jitter keeps them from restarting together
+        "max_requests": settings.SERVER_MAX_REQUESTS,
+        "max_requests_jitter": settings.SERVER_MAX_REQUESTS_JITTER,
+        "timeout": settings.SERVER_TIMEOUT,
+        # On SIGTERM workers stop accepting and get this long to finish in-flight requests
+        "graceful_timeout": settings.SERVER_GRACEFUL_TIMEOUT,
+        "keepalive": settings.SERVER_KEEPALIVE,
+        "backlog": settings.SERVER_BACKLOG,
+        # Heartbeat files on tmpfs; an overlay filesystem can stall workers into timeouts
+        "worker_tmp_dir": "/dev/shm" if os.path.isdir("/dev/shm") else None,
+        "accesslog": "-",
+        "errorlog": "-",
+        "post_fork": post_fork,
+    }
+
+
+class Server(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if value is not None and key in self.cfg.settings:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from .main import app
+        return app
+
+
+def main() -> None:
+    Server(gunicorn_options()).run()
+
+
+if __name__ == "__main__":
+    main()
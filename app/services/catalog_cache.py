@@ -0,0 +1,90 @@
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .. import models
+from ..api.auth_utlis import settings
+from ..api.principal_cache import TTLCache
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in candidates or etag in [tag.removeprefix("W/") for tag in candidates]
+
+
+def cache_control() -> str:
+    return f"public, max-age={settings.PRODUCT_CACHE_MAX_AGE_SECONDS}"
+
+
+# Product id -> version
+@lru_cache
+def _product_versions() -> TTLCache:
+    return TTLCache(settings.ETAG_CACHE_SIZE, settings.ETAG_CACHE_TTL_SECONDS)
+
+
+def bump_catalog_version(db: Session) -> None:
+    """Advance the catalog version as part of the caller's transaction.
+
+    Call it from writes that change what the product list shows; stock-only
+    changes (checkouts) do not, since the list omits stock.
+    """
+    table = models.CatalogVersion
+    stmt = pg_insert(table).values(id=1, version=1)
+    db.execute(stmt.on_conflict_do_update(index_elements=[table.id], set_={"version": table.version + 1}))
+
+
+class CatalogVersions:
+    """Per-worker view of product versions and the catalog version, for ETags.
+
+    Product.version comes from catalog_version_seq and changes with every write
+    to the row; the catalog version is the committed catalog_version row. Writes
+    in this worker invalidate the cached values at once; other workers see them
+    after ETAG_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog: Optional[tuple[int, float]] = None
+
+    def product_etag(self, product_id) -> Optional[str]:
+        version = _product_versions().get(str(product_id).lower())
+        return None if version is None else f'"p{version}"'
+
+    def remember_product(self, product_id, version: int) -> str:
+        _product_versions().set(str(product_id).lower(), version)
+        return f'"p{version}"'
+
+    def catalog_version(self, db: Session) -> int:
+        with self._lock:
+            if self._catalog is not None and self._catalog[1] > time.monotonic():
+                return self._catalog[0]
+        version = db.execute(select(models.CatalogVersion.version).where(models.CatalogVersion.id == 1)).scalar() or 0
+        with self._lock:
+            self._catalog = (version, time.monotonic() + settings.ETAG_CACHE_TTL_SECONDS)
+        return version
+
+    def list_etag(self, db: Session, *parts) -> str:
+        key = ":".join(str(part) for part in (self.catalog_version(db), *parts))
+        return f'"c{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+    def invalidate_catalog(self) -> None:
+        with self._lock:
+            self._catalog = None
+
+    def forget_products(self, product_ids: Iterable) -> None:
+        for product_id in product_ids:
+            _product_versions().pop(str(product_id).lower())
+
+    def clear(self) -> None:
+        _product_versions().clear()
+        self.invalidate_catalog()
+
+
+versions = CatalogVersions()
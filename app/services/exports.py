@@ -0,0 +1,99 @@
+import csv
+import io
+import itertools
+import json
+from typing import Iterator
+from sqlalchemy import select
+from .. import models
+from ..database import SessionLocal
+from .status_registry import registry
+
+YIELD_PER = 1000
+
+USER_FIELDS = ["id", "username", "email", "is_admin", "is_active", "created_at", "updated_at"]
+ORDER_FIELDS = ["id", "user_id", "status", "total_price", "created_at", "updated_at"]
+ORDER_CSV_FIELDS = ORDER_FIELDS + ["product_id", "quantity"]
+
+
+def _stream(db, stmt):
+    # Server-side cursor: rows are fetched YIELD_PER at a time instead of all at once
+    return db.execute(stmt.execution_options(stream_results=True, yield_per=YIELD_PER))
+
+
+def iter_users(db) -> Iterator[dict]:
+    stmt = select(*(getattr(models.User, field) for field in USER_FIELDS)).order_by(models.User.created_at, models.User.id)
+    for row in _stream(db, stmt):
+        yield dict(row._mapping)
+
+
+def iter_orders(db) -> Iterator[dict]:
+    """Yield one dict per order with its line items, from a single streamed join."""
+    stmt = (
+        select(
+            models.Order.id,
+            models.Order.user_id,
+            models.Order.status_id,
+            models.Order.total_price,
+            models.Order.created_at,
+            models.Order.updated_at,
+            models.OrderProduct.product_id,
+            models.OrderProduct.quantity,
+        )
+        .outerjoin(models.OrderProduct, models.OrderProduct.order_id == models.Order.id)
+        .order_by(models.Order.created_at, models.Order.id)
+    )
+    rows = _stream(db, stmt)
+    for _, lines in itertools.groupby(rows, key=lambda row: row.id):
+        lines = list(lines)
+        first = lines[0]
+        yield {
+            "id": first.id,
+            "user_id": first.user_id,
+            "status": registry.get_name(db, first.status_id),
+            "total_price": first.total_price,
+            "created_at": first.created_at,
+            "updated_at": first.updated_at,
+            "products": [
+                {"product_id": line.product_id, "quantity": line.quantity}
+                for line in lines
+                if line.quantity is not None
+            ],
+        }
+
+
+def _ndjson(records: Iterator[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, default=str) + "\n"
+
+
+def _csv(records: Iterator[dict], fields: list[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _order_csv_rows(orders: Iterator[dict]) -> Iterator[dict]:
+    # One CSV row per line item, with the order columns repeated
+    for order in orders:
+        for line in order["products"] or [{"product_id": None, "quantity": None}]:
+            yield {**order, **line}
+
+
+def export_users(format: str) -> Iterator[str]:
+    with SessionLocal() as db:
+        records = iter_users(db)
+        yield from _csv(records, USER_FIELDS) if format == "csv" else _ndjson(records)
+
+
+def export_orders(format: str) -> Iterator[str]:
+    with SessionLocal() as db:
+        records = iter_orders(db)
+        if format == "csv":
+            yield from _csv(_order_csv_rows(records), ORDER_CSV_FIELDS)
+        else:
+            yield from _ndjson(records)
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import threading
+import time
+import weakref
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+from ..api.auth_utlis import settings
+from ..api.principal_cache import TTLCache
+
+# (user_id, key) -> (request_hash, response_body) for completed requests
+@lru_cache
+def _responses() -> TTLCache:
+    return TTLCache(settings.IDEMPOTENCY_CACHE_SIZE, settings.IDEMPOTENCY_CACHE_TTL_SECONDS)
+
+# One lock per in-flight key so duplicates inside this process queue up behind the first
+_locks: "weakref.WeakValueDictionary[tuple, threading.Lock]" = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+POLL_INTERVAL_SECONDS = 0.1
+
+
+def request_hash(payload) -> str:
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _key_lock(cache_key: tuple) -> threading.Lock:
+    with _locks_guard:
+        lock = _locks.get(cache_key)
+        if lock is None:
+            lock = threading.Lock()
+            _locks[cache_key] = lock
+        return lock
+
+
+def _replay(record_hash: str, body, expected_hash: str):
+    if record_hash != expected_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request body.",
+        )
+    return body
+
+
+def _claim(db: Session, user_id: UUID, key: str, hashed: str, claimed_at: datetime) -> models.IdempotencyKey | None:
+    """Insert the pending marker. Returns the existing record if another request owns the key.
+
+    ``claimed_at`` identifies this claim: the response is only stored while the
+    key still carries it, so a request whose key was taken over cannot complete.
+    """
+    db.add(models.IdempotencyKey(user_id=user_id, key=key, request_hash=hashed, created_at=claimed_at))
+    try:
+        db.commit()
+        return None
+    except IntegrityError:
+        db.rollback()
+        record = db.get(models.IdempotencyKey, (user_id, key))
+        if record is None:
+            # Not a duplicate key (e.g. the user no longer exists)
+            raise
+
+    stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+    if record is not None and record.completed_at is None and record.created_at < stale_before:
+        # The owner died mid-request; take the key over
+        result = db.execute(
+            update(models.IdempotencyKey)
+            .where(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+                models.IdempotencyKey.completed_at.is_(None),
+                models.IdempotencyKey.created_at < stale_before,
+            )
+            .values(request_hash=hashed, created_at=claimed_at)
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return None
+        db.refresh(record)
+    return record
+
+
+def _wait_for_completion(db: Session, record: models.IdempotencyKey) -> models.IdempotencyKey:
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while record.completed_at is None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL_SECONDS)
+        db.expire(record)
+        db.refresh(record)
+    if record.completed_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still being processed.",
+        )
+    return record
+
+
+def run_idempotent(db: Session, user_id: UUID, key: str, payload, handler):
+    """Run ``handler()`` at most once per (user, Idempotency-Key).
+
+    The first request stores its JSON response, later requests with the same key
+    get that stored response back without calling the handler. Duplicates that
+    arrive while the first is still running wait for it to finish.
+
+    ``handler`` must flush but not commit: its writes and the stored response
+    are committed together here, so a crash can never leave the work done with
+    the key still pending (and open to a takeover that would repeat it).
+    """
+    hashed = request_hash(payload)
+    cache_key = (user_id, key)
+
+    cached = _responses().get(cache_key)
+    if cached is not None:
+        return _replay(cached[0], cached[1], hashed)
+
+    with _key_lock(cache_key):
+        cached = _responses().get(cache_key)
+        if cached is not None:
+            return _replay(cached[0], cached[1], hashed)
+
+        claimed_at = datetime.now(timezone.utc)
+        record = _claim(db, user_id, key, hashed, claimed_at)
+        if record is not None:
+            if record.request_hash != hashed:
+                return _replay(record.request_hash, None, hashed)
+            record = _wait_for_completion(db, record)
+            _responses().set(cache_key, (record.request_hash, record.response_body))
+            return record.response_body
+
+        try:
+            body = jsonable_encoder(handler())
+        except Exception:
+            db.rollback()
+            # Release the key so the client can retry after a failure
+            db.execute(
+                delete(models.IdempotencyKey).where(
+                    models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.key == key
+                )
+            )
+            db.commit()
+            raise
+
+        completed = db.execute(
+            update(models.IdempotencyKey)
+            .where(
+                models.IdempotencyKey.user_id == user_id,
+                models.IdempotencyKey.key == key,
+                models.IdempotencyKey.created_at == claimed_at,
+                models.IdempotencyKey.completed_at.is_(None),
+            )
+            .values(response_body=body, completed_at=datetime.now(timezone.utc))
+        )
+        if completed.rowcount != 1:
+            # We ran past IDEMPOTENCY_PENDING_TIMEOUT_SECONDS and another request took the key
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed.",
+            )
+        db.commit()
+        _responses().set(cache_key, (hashed, body))
+        return body
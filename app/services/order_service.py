@@ -1,14 +1,23 @@
-from typing import List
+from datetime import timezone
+from typing import List, Optional
 import uuid
-from sqlalchemy.orm import Session
+from sqlalchemy import case, insert, or_, select, update
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException , status
 from .. import models, schemas
+from . import catalog_cache, outbox, pagination, status_registry
 
 
 def has_active_orders(user_id: str, db: Session) -> bool:
+    # Active means not finished yet: anything but completed or canceled
+    active_ids = [
+        status_id
+        for name, status_id in status_registry.registry.items(db)
+        if name not in ("completed", "canceled")
+    ]
     return (
-        db.query(models.Order)
-        .filter(models.Order.user_id == user_id, models.Order.status == "active")
+        db.query(models.Order.id)
+        .filter(models.Order.user_id == user_id, models.Order.status_id.in_(active_ids))
         .first()
         is not None
     )
@@ -23,115 +32,348 @@ def get_product_by_id(product_id: str, db: Session) -> models.Product:
         )
     return product
 
-def update_product_stock(product_id: str, quantity: int, db: Session) -> None:
-    product = get_product_by_id(product_id, db)
+def update_product_stock(product_id: str, quantity: int, db: Session) -> int:
+    # Check and decrement in one statement, so concurrent buyers can never oversell
+    new_stock = db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id, models.Product.stock >= quantity)
+        .values(stock=models.Product.stock - quantity, version=models.catalog_version_seq.next_value())
+        .returning(models.Product.stock)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
 
-    if product.stock < quantity:
+    if new_stock is None:
+        db.rollback()
+        get_product_by_id(product_id, db)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Insufficient stock for product."
         )
 
-    product.stock -= quantity
     db.commit()
+    catalog_cache.versions.forget_products([product_id])
+    return new_stock
+
+def merge_order_lines(products) -> dict:
+    # Collapse repeated product_ids into a single line with the summed quantity
+    quantities = {}
+    for product_data in products:
+        quantities[product_data.product_id] = quantities.get(product_data.product_id, 0) + product_data.quantity
+    return quantities
+
+def load_products(db: Session, product_ids) -> dict:
+    # Load every requested product in one round trip, without locking them
+    products = db.query(models.Product).filter(models.Product.id.in_(product_ids)).all()
+    return {product.id: product for product in products}
 
-def calculate_total_price(db: Session, products):
+def calculate_total_price(products: dict, quantities: dict):
     total_price = 0
 
-    for product_data in products:
-        product = db.query(models.Product).filter(models.Product.id == product_data.product_id).first()
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
         if not product:
-            raise HTTPException(status_code=404, detail=f"Product {product_data.product_id} not found.")
-        
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found.")
+
         if not product.is_available:
             raise HTTPException(
                 status_code=400, detail=f"Product '{product.name}' is currently unavailable."
             )
 
-        if product.stock < product_data.quantity:
+        if product.stock < quantity:
             raise HTTPException(
                 status_code=400, detail=f"Insufficient stock for product '{product.name}'."
             )
 
-        total_price += product.price * product_data.quantity
+        total_price += product.price * quantity
 
     return total_price
 
-def add_order_products(db: Session, order_id: uuid.UUID, products):
-    for product_data in products:
-        product = get_product_by_id(product_data.product_id, db)
+def add_order_products(db: Session, order_id: uuid.UUID, quantities: dict, products: dict):
+    db.execute(
+        insert(models.OrderProduct),
+        [
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "unit_price": products[product_id].price,
+            }
+            for product_id, quantity in quantities.items()
+        ],
+    )
 
-        order_product = models.OrderProduct(
-            order_id=order_id,
-            product_id=product.id,
-            quantity=product_data.quantity,
-        )
-        db.add(order_product)
+def decrement_stock(db: Session, quantities: dict, products: dict) -> None:
+    """Atomically take stock for the whole cart in one UPDATE ... RETURNING.
 
-        update_product_stock(product.id, product_data.quantity, db)
+    The stock guard is evaluated against the row as locked by the UPDATE, so it
+    is authoritative; the in-memory check before it only fails fast. Rows are
+    locked in id order, and ``create_order`` takes these locks before any other
+    row lock, so carts sharing products cannot deadlock with each other.
+    """
+    requested = case(quantities, value=models.Product.id)
+    locked_ids = (
+        select(models.Product.id)
+        .where(models.Product.id.in_(list(quantities)))
+        .order_by(models.Product.id)
+        .with_for_update()
+    )
+    updated = db.execute(
+        update(models.Product)
+        .where(models.Product.id.in_(locked_ids), models.Product.stock >= requested)
+        .values(stock=models.Product.stock - requested, version=models.catalog_version_seq.next_value())
+        .returning(models.Product.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
 
-    db.commit()
+    updated = set(updated)
+    short = [product_id for product_id in quantities if product_id not in updated]
+    if short:
+        names = ", ".join(f"'{products[product_id].name}'" for product_id in short)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Insufficient stock for product {names}."
+        )
 
-def create_order(db: Session, user_id: uuid.UUID, order_data: schemas.OrderCreateRequest):
-    status = db.query(models.OrderStatus).filter(models.OrderStatus.name == "pending").first()
-    if not status:
+def create_order(db: Session, user_id: uuid.UUID, order_data: schemas.OrderCreateRequest, commit: bool = True):
+    """Place an order. With ``commit=False`` the order is only flushed, and the
+    caller commits and then calls ``catalog_cache.versions.forget_products``."""
+    pending_id = status_registry.registry.get_id(db, "pending")
+    if not pending_id:
         raise HTTPException(status_code=500, detail="Default status 'pending' not found.")
 
-    total_price = calculate_total_price(db, order_data.products)
+    quantities = merge_order_lines(order_data.products)
+
+    try:
+        products = load_products(db, list(quantities))
+        total_price = calculate_total_price(products, quantities)
+        # First: the product rows are the only existing rows a checkout locks, so
+        # it never holds another lock while waiting on a hot product
+        decrement_stock(db, quantities, products)
+
+        new_order = models.Order(user_id=user_id, status_id=pending_id, total_price=total_price)
+        db.add(new_order)
+        db.flush()
+
+        add_order_products(db, new_order.id, quantities, products)
+        # The daily rollups are updated from this event by rollups.apply_order_events
+        outbox.enqueue(db, outbox.ORDER_CREATED, {
+            **order_event(new_order),
+            "status_id": str(pending_id),
+            "products": [
+                {"product_id": str(product_id), "quantity": quantity, "unit_price": str(products[product_id].price)}
+                for product_id, quantity in quantities.items()
+            ],
+        })
+    except Exception:
+        db.rollback()
+        raise
+
+    if not commit:
+        db.flush()
+        return new_order
 
-    new_order = models.Order(user_id=user_id, status_id=status.id, total_price=total_price)
-    db.add(new_order)
     db.commit()
     db.refresh(new_order)
-
-    add_order_products(db, new_order.id, order_data.products)
+    catalog_cache.versions.forget_products(quantities)
 
     return new_order
 
 
-def get_order_by_id(order_id: str, db: Session):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+def order_event(order) -> dict:
+    """Payload fields shared by every order event, including what the rollups are keyed by."""
+    return {
+        "order_id": str(order.id),
+        "user_id": str(order.user_id) if order.user_id else None,
+        "day": order.created_at.astimezone(timezone.utc).date().isoformat(),
+        "total_price": str(order.total_price),
+    }
+
+def status_event(db: Session, order, from_status_id: Optional[uuid.UUID], to_status_id: uuid.UUID) -> dict:
+    return {
+        **order_event(order),
+        "from_status": status_registry.registry.get_name(db, from_status_id),
+        "to_status": status_registry.registry.get_name(db, to_status_id),
+        "from_status_id": str(from_status_id) if from_status_id else None,
+        "to_status_id": str(to_status_id),
+    }
+
+# Transition rules shared by the single-order and bulk paths
+def transition_error(db: Session, from_status_id: Optional[uuid.UUID], to_status_id: uuid.UUID) -> Optional[str]:
+    """Why an order may not move between the two statuses, or None if it may."""
+    names = status_registry.registry
+    if names.get_name(db, to_status_id) == "canceled" and names.get_name(db, from_status_id) != "pending":
+        return "Only pending orders can be canceled"
+    return None
+
+def transition_event_type(db: Session, to_status_id: uuid.UUID) -> str:
+    if status_registry.registry.get_name(db, to_status_id) == "canceled":
+        return outbox.ORDER_CANCELED
+    return outbox.ORDER_STATUS_CHANGED
+
+
+def order_summary(order: models.Order, db: Session) -> dict:
+    # Order columns with the status name resolved from the registry, no join needed
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "status": status_registry.registry.get_name(db, order.status_id),
+        "total_price": float(order.total_price),
+        "created_at": order.created_at,
+        "updated_at": order.updated_at,
+    }
+
+def to_order_detail(order: models.Order, db: Session) -> schemas.OrderDetailResponse:
+    return schemas.OrderDetailResponse(
+        **order_summary(order, db),
+        products=[
+            schemas.OrderLineResponse(product_id=line.product_id, quantity=line.quantity)
+            for line in order.products
+        ],
+    )
+
+def get_order_by_id(order_id: str, db: Session, lock: bool = False):
+    query = db.query(models.Order).filter(models.Order.id == order_id)
+    if lock:
+        # Status transitions read the current status under the row lock, so concurrent ones serialize
+        query = query.with_for_update().populate_existing()
+    order = query.first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
-def update_order_status(order_id: str, status_name: str, db: Session):
-    order = get_order_by_id(order_id, db)
+def get_order_detail(order_id: str, db: Session) -> schemas.OrderDetailResponse:
+    # Line items come from a single selectin query, the status name from the registry
+    order = (
+        db.query(models.Order)
+        .options(selectinload(models.Order.products))
+        .filter(models.Order.id == order_id)
+        .first()
+    )
     if not order:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Order with ID {order_id} not found."
-        )
-    status = db.query(models.OrderStatus).filter(models.OrderStatus.name == status_name).first()
-    if not status:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return to_order_detail(order, db)
+
+def update_order_status(order_id: str, status_name: str, db: Session):
+    status_id = status_registry.registry.get_id(db, status_name)
+    if not status_id:
         raise HTTPException(status_code=400, detail="Invalid status")
-    order.status_id = status.id
+    order = get_order_by_id(order_id, db, lock=True)
+    if order.status_id == status_id:
+        db.rollback()
+        return order
+    error = transition_error(db, order.status_id, status_id)
+    if error:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=error)
+    outbox.enqueue(db, transition_event_type(db, status_id), status_event(db, order, order.status_id, status_id))
+    order.status_id = status_id
     db.commit()
     db.refresh(order)
     return order
 
+def bulk_update_order_status(order_ids: List[uuid.UUID], status_name: str, db: Session) -> List[dict]:
+    """Move many orders to ``status_name`` with the same rules and events as
+    ``update_order_status``. Orders the rules exclude are reported as rejected."""
+    status_id = status_registry.registry.get_id(db, status_name)
+    if not status_id:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    order_ids = list(dict.fromkeys(order_ids))
+
+    # Only statuses the rules allow to move to status_id
+    allowed = [
+        allowed_id
+        for _, allowed_id in status_registry.registry.items(db)
+        if allowed_id != status_id and transition_error(db, allowed_id, status_id) is None
+    ]
+    movable = models.Order.status_id.in_(allowed)
+    if transition_error(db, None, status_id) is None:
+        movable = or_(movable, models.Order.status_id.is_(None))
+    # Lock the targets in id order, then move them in one statement that returns each previous status
+    previous = (
+        select(models.Order.id, models.Order.status_id)
+        .where(models.Order.id.in_(order_ids))
+        .order_by(models.Order.id)
+        .with_for_update()
+        .subquery("previous")
+    )
+    changed = db.execute(
+        update(models.Order)
+        .where(models.Order.id == previous.c.id, movable)
+        .values(status_id=status_id)
+        .returning(
+            models.Order.id,
+            previous.c.status_id.label("previous_status_id"),
+            models.Order.user_id,
+            models.Order.total_price,
+            models.Order.created_at,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    changed = sorted(changed, key=lambda row: row.id)
+    # The rollups are adjusted from these events, aggregated per batch by rollups.apply_order_events
+    outbox.enqueue_many(
+        db,
+        transition_event_type(db, status_id),
+        [status_event(db, row, row.previous_status_id, status_id) for row in changed],
+    )
+
+    previous_ids = {row.id: row.previous_status_id for row in changed}
+    remaining = [order_id for order_id in order_ids if order_id not in previous_ids]
+    untouched = dict(
+        db.execute(select(models.Order.id, models.Order.status_id).where(models.Order.id.in_(remaining))).all()
+        if remaining else ()
+    )
+    db.commit()
+
+    results = []
+    for order_id in order_ids:
+        if order_id in previous_ids:
+            previous_name = status_registry.registry.get_name(db, previous_ids[order_id])
+            results.append({"order_id": order_id, "result": "updated", "previous_status": previous_name})
+        elif order_id not in untouched:
+            results.append({"order_id": order_id, "result": "not_found"})
+        elif untouched[order_id] == status_id:
+            results.append({"order_id": order_id, "result": "unchanged", "previous_status": status_name})
+        else:
+            results.append({
+                "order_id": order_id,
+                "result": "rejected",
+                "previous_status": status_registry.registry.get_name(db, untouched[order_id]),
+                "detail": transition_error(db, untouched[order_id], status_id),
+            })
+    return results
+
 def cancel_order(order_id: str, db: Session):
-    order = get_order_by_id(order_id, db)
-    if order.status.name != "pending":
-        raise HTTPException(status_code=400, detail="Only pending orders can be canceled")
-    status = db.query(models.OrderStatus).filter(models.OrderStatus.name == "canceled").first()
-    if not status:
+    canceled_id = status_registry.registry.get_id(db, "canceled")
+    if not canceled_id:
         raise HTTPException(status_code=500, detail="Status 'canceled' not found")
-    order.status_id = status.id
+    order = get_order_by_id(order_id, db, lock=True)
+    error = transition_error(db, order.status_id, canceled_id)
+    if error:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=error)
+    outbox.enqueue(db, transition_event_type(db, canceled_id), status_event(db, order, order.status_id, canceled_id))
+    order.status_id = canceled_id
     db.commit()
     return {"message": f"Order {order_id} has been successfully canceled."}
 
 
 
 
-def get_orders_for_user(user_id: str, db: Session) -> List[schemas.OrderDetailResponse]:
-    # Query all orders to the given user_id
-    orders = db.query(models.Order).filter(models.Order.user_id == user_id).all()
+def get_orders_for_user(user_id: str, db: Session, cursor: str | None = None, page_size: int = 10) -> dict:
+    # Query one page of orders for the given user_id
+    query = (
+        db.query(models.Order)
+        .options(selectinload(models.Order.products))
+        .filter(models.Order.user_id == user_id)
+    )
+    page = pagination.paginate(query, models.Order, cursor, page_size)
+    page["items"] = [to_order_detail(order, db) for order in page["items"]]
 
-    if not orders:
+    if not page["items"] and cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No orders found for the specified user."
         )
 
-    return orders
\ No newline at end of file
+    return page
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""Transactional outbox for order lifecycle events.
+
+Services call ``enqueue`` inside their own transaction, so an event exists if
+and only if the change it describes was committed. ``OutboxDispatcher`` then
+drains the table in the background and hands each batch to the in-process
+handlers registered for its event type.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from .. import metrics, models
+from ..api.auth_utlis import settings
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+ORDER_CANCELED = "order.canceled"
+
+Handler = Callable[[Session, list[models.OutboxEvent]], None]
+
+# event type -> handlers
+_handlers: dict[str, list[Handler]] = defaultdict(list)
+
+
+def register_handler(event_types: str | tuple[str, ...], handler: Handler) -> None:
+    """Call ``handler(db, events)`` with the due events of the given types.
+
+    A handler registered for several types gets them together, in id order, in
+    one call per batch. It runs in the dispatcher's transaction, so its writes
+    through ``db`` commit together with the events being marked processed and
+    happen exactly once. Anything else it does (HTTP calls, queues) is
+    at-least-once: an event is redelivered, to every handler of its type, when
+    any handler fails on it, so those side effects must be idempotent.
+    """
+    for event_type in (event_types,) if isinstance(event_types, str) else event_types:
+        _handlers[event_type].append(handler)
+
+
+def handler(*event_types: str):
+    """Decorator form of ``register_handler``."""
+    def decorator(func):
+        register_handler(event_types, func)
+        return func
+    return decorator
+
+
+def enqueue(db: Session, event_type: str, payload: dict) -> None:
+    # No commit: the event is written by the caller's transaction
+    db.add(models.OutboxEvent(event_type=event_type, payload=payload))
+
+
+def enqueue_many(db: Session, event_type: str, payloads: list[dict]) -> None:
+    """Write several events of one type in a single INSERT."""
+    if payloads:
+        db.execute(insert(models.OutboxEvent), [{"event_type": event_type, "payload": payload} for payload in payloads])
+
+
+def _pending(db: Session):
+    return db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.processed_at.is_(None), models.OutboxEvent.failed_at.is_(None)
+    )
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts, 300))
+
+
+def _deliver(db: Session, events: list[models.OutboxEvent]) -> None:
+    batches: dict[Handler, list[models.OutboxEvent]] = {}
+    for event in events:
+        for deliver in _handlers.get(event.event_type, []):
+            batches.setdefault(deliver, []).append(event)
+    for deliver, batch in batches.items():
+        deliver(db, batch)
+
+
+def _count_by_type(events: list[models.OutboxEvent]) -> dict[str, int]:
+    counts: dict[str, int] = defaultdict(int)
+    for event in events:
+        counts[event.event_type] += 1
+    return counts
+
+
+def dispatch_batch(db: Session, batch_size: int) -> int:
+    """Deliver one batch of due events. Returns how many events were claimed.
+
+    The whole batch is tried at once; if that fails each event is retried on its
+    own, so only the events a handler actually fails on are rescheduled.
+    """
+    now = datetime.now(timezone.utc)
+    # SKIP LOCKED lets every worker run a dispatcher without double delivery
+    events = (
+        _pending(db)
+        .filter(models.OutboxEvent.available_at <= now)
+        .order_by(models.OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not events:
+        db.rollback()
+        return 0
+
+    delivered = events
+    try:
+        with db.begin_nested():
+            _deliver(db, events)
+    except Exception:
+        logger.warning("Outbox batch of %d events failed, retrying one by one", len(events), exc_info=True)
+        delivered = []
+        for event in events:
+            try:
+                with db.begin_nested():
+                    _deliver(db, [event])
+            except Exception as e:
+                logger.exception("Outbox handler failed for %s event %s", event.event_type, event.id)
+                metrics.OUTBOX_FAILURES.inc(event.event_type)
+                event.attempts += 1
+                event.last_error = repr(e)[:2000]
+                if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                    event.failed_at = now
+                else:
+                    event.available_at = now + _retry_delay(event.attempts)
+            else:
+                delivered.append(event)
+
+    for event in delivered:
+        event.processed_at = now
+    db.commit()
+    for event_type, count in _count_by_type(delivered).items():
+        metrics.OUTBOX_DISPATCHED.inc(event_type, amount=count)
+    return len(events)
+
+
+def purge_processed(db: Session, older_than: timedelta, batch_size: int = 1000) -> int:
+    """Delete events processed more than ``older_than`` ago. Failed events are kept.
+
+    Works in batches of ``batch_size`` from the oldest id, each in its own short
+    transaction. Returns how many events were deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - older_than
+    deleted = 0
+    while True:
+        doomed = (
+            select(models.OutboxEvent.id)
+            .where(models.OutboxEvent.processed_at < cutoff)
+            .order_by(models.OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        count = db.execute(delete(models.OutboxEvent).where(models.OutboxEvent.id.in_(doomed))).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def get_stats(db: Session) -> dict:
+    pending, oldest = _pending(db).with_entities(func.count(), func.min(models.OutboxEvent.created_at)).one()
+    failed = (
+        db.query(func.count(models.OutboxEvent.id))
+        .filter(models.OutboxEvent.failed_at.isnot(None))
+        .scalar()
+    )
+    lag = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+    return {"pending": pending, "failed": failed, "oldest_pending_age_seconds": lag}
+
+
+class OutboxDispatcher:
+    """Background thread that polls the outbox and dispatches in batches.
+
+    Every ``maintenance_interval`` seconds it also refreshes the backlog gauges
+    and purges events processed more than ``retention`` ago.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int,
+        poll_interval: float,
+        maintenance_interval: float = 60,
+        retention: timedelta | None = None,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.maintenance_interval = maintenance_interval
+        self.retention = retention
+        self._next_maintenance = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _maintain(self) -> None:
+        with self.session_factory() as db:
+            if self.retention is not None:
+                deleted = purge_processed(db, self.retention)
+                if deleted:
+                    logger.info("Purged %d processed outbox events", deleted)
+            stats = get_stats(db)
+        metrics.OUTBOX_PENDING.set(value=stats["pending"])
+        metrics.OUTBOX_LAG.set(value=stats["oldest_pending_age_seconds"])
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self.session_factory() as db:
+                    claimed = dispatch_batch(db, self.batch_size)
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                claimed = 0
+            if time.monotonic() >= self._next_maintenance:
+                self._next_maintenance = time.monotonic() + self.maintenance_interval
+                try:
+                    self._maintain()
+                except Exception:
+                    logger.exception("Outbox maintenance failed")
+            # A full batch means there is probably more waiting; go again straight away
+            if claimed < self.batch_size:
+                self._stop.wait(self.poll_interval)
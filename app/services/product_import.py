@@ -0,0 +1,150 @@
+import codecs
+import csv
+import json
+import math
+from typing import AsyncIterator
+from pydantic import ValidationError
+from .. import schemas
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# Column limits of models.Product that ProductCreate does not check
+NAME_MAX_LENGTH = 255
+STOCK_MAX = 2**31 - 1
+
+CSV_TYPES = {"text/csv", "application/csv"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Split the body into lines as it arrives; only one partial line is ever buffered
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], content_type: str) -> AsyncIterator[tuple[int, dict | str]]:
+    """Yield (line number, record) pairs, or (line number, error message) for unparsable lines.
+
+    CSV bodies need a header row; quoted fields spanning several lines are not supported.
+    """
+    header = None
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        if content_type in CSV_TYPES:
+            try:
+                values = next(csv.reader([line]))
+            except csv.Error as e:
+                yield line_no, f"Invalid CSV: {e}"
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield line_no, f"Expected {len(header)} fields, got {len(values)}."
+                continue
+            yield line_no, dict(zip(header, values))
+        else:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, "Each line must be a JSON object."
+                continue
+            yield line_no, record
+
+
+def validate_record(record: dict) -> dict:
+    # Empty CSV cells fall back to the schema defaults
+    cleaned = {key: value for key, value in record.items() if value not in ("", None)}
+    product = schemas.ProductCreate(**cleaned)
+    # Rows the database would reject are caught here, so they never sink a batch
+    if len(product.name) > NAME_MAX_LENGTH:
+        raise ValueError(f"name: must be at most {NAME_MAX_LENGTH} characters")
+    if product.stock > STOCK_MAX:
+        raise ValueError(f"stock: must be at most {STOCK_MAX}")
+    if not math.isfinite(float(product.price)):
+        raise ValueError("price: out of range")
+    for field in ("name", "description"):
+        if "\x00" in (getattr(product, field) or ""):
+            raise ValueError(f"{field}: must not contain NUL characters")
+    return {
+        "name": product.name,
+        "description": product.description,
+        "price": float(product.price),
+        "stock": product.stock,
+        "is_available": product.is_available,
+    }
+
+
+async def import_products(chunks: AsyncIterator[bytes], content_type: str, upsert_batch) -> dict:
+    """Stream records from ``chunks`` into ``upsert_batch`` in batches of BATCH_SIZE.
+
+    ``upsert_batch(rows)`` is awaited for every batch and must return the number of
+    rows written. Bad rows are reported in ``errors`` without stopping the import.
+    A batch the database rejects is split in halves and retried until the failing
+    rows are isolated, so only those are reported; ``upsert_batch`` must therefore
+    leave nothing written when it raises.
+    """
+    summary = {"processed": 0, "upserted": 0, "failed": 0, "errors": []}
+
+    def fail(line_no: int, message: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_no, "error": message})
+
+    # Keyed by name: a later row for the same product replaces the earlier one in the batch
+    batch: dict[str, tuple[int, dict]] = {}
+
+    async def write(entries: list[tuple[int, dict]]):
+        try:
+            summary["upserted"] += await upsert_batch([row for _, row in entries])
+        except Exception as e:
+            if len(entries) == 1:
+                error = getattr(e, "orig", e)
+                detail = str(error).strip().splitlines()
+                message = f"Rejected by the database: {error.__class__.__name__}"
+                fail(entries[0][0], f"{message}: {detail[0]}" if detail else message)
+                return
+            middle = len(entries) // 2
+            await write(entries[:middle])
+            await write(entries[middle:])
+
+    async def flush():
+        if not batch:
+            return
+        await write(sorted(batch.values(), key=lambda entry: entry[0]))
+        batch.clear()
+
+    async for line_no, record in iter_records(chunks, content_type):
+        summary["processed"] += 1
+        if isinstance(record, str):
+            fail(line_no, record)
+            continue
+        try:
+            row = validate_record(record)
+        except ValidationError as e:
+            fail(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        except ValueError as e:
+            fail(line_no, str(e))
+            continue
+        batch[row["name"]] = (line_no, row)
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+
+    await flush()
+    return summary
@@ -1,7 +1,11 @@
-from typing import List
+from typing import List, Optional
+from uuid import UUID
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from .. import models, schemas
+from . import catalog_cache, pagination
 
 # Create a Product
 def create_product(db: Session, product_data: schemas.ProductCreate):
@@ -17,8 +21,10 @@ def create_product(db: Session, product_data: schemas.ProductCreate):
         is_available=product_data.is_available
     )
     db.add(new_product)
+    catalog_cache.bump_catalog_version(db)
     db.commit()
     db.refresh(new_product)
+    catalog_cache.versions.invalidate_catalog()
     return new_product
 
 # Get Product by ID
@@ -28,9 +34,29 @@ def get_product_by_id(product_id: str, db: Session):
         raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found.")
     return product
 
+# Get many products in one query, in the order requested
+def get_products_by_ids(db: Session, product_ids: list[UUID]) -> dict:
+    product_ids = list(dict.fromkeys(product_ids))
+    found = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_(product_ids))
+    }
+    for product in found.values():
+        catalog_cache.versions.remember_product(product.id, product.version)
+    return {
+        "items": [found[product_id] for product_id in product_ids if product_id in found],
+        "missing": [product_id for product_id in product_ids if product_id not in found],
+    }
+
 # Update Product by ID
-def update_product(product_id: str, update_data: schemas.ProductUpdate, db: Session):
+def update_product(product_id: str, update_data: schemas.ProductUpdate, db: Session, expected_version: Optional[int] = None):
     product = get_product_by_id(product_id, db)
+    if expected_version is not None:
+        # Optimistic concurrency: lock the row and reject the write if it changed since the client read it
+        db.refresh(product, with_for_update=True)
+        if product.version != expected_version:
+            db.rollback()
+            raise HTTPException(status_code=412, detail="Product was modified by another request.")
 
     if update_data.name:
         existing_product = db.query(models.Product).filter(models.Product.name == update_data.name, models.Product.id != product_id).first()
@@ -47,27 +73,68 @@ def update_product(product_id: str, update_data: schemas.ProductUpdate, db: Sess
     if update_data.is_available is not None:
         product.is_available = update_data.is_available
 
+    product.version = models.catalog_version_seq.next_value()
+    listed_change = any(
+        value is not None for field, value in update_data.model_dump().items() if field != "stock"
+    )
+    if listed_change:
+        catalog_cache.bump_catalog_version(db)
     db.commit()
     db.refresh(product)
+    catalog_cache.versions.forget_products([product.id])
+    if listed_change:
+        catalog_cache.versions.invalidate_catalog()
     return product
 
 # Delete Product by ID
 def delete_product(product_id: str, db: Session):
     product = get_product_by_id(product_id, db)
     db.delete(product)
+    catalog_cache.bump_catalog_version(db)
     db.commit()
+    catalog_cache.versions.forget_products([product.id])
+    catalog_cache.versions.invalidate_catalog()
     return {"message": "Product deleted successfully"}
 
-# List Products
-def list_products(db: Session, page: int = 1, page_size: int = 10) -> List[schemas.Product]:
-    offset = (page - 1) * page_size
-    products = db.query(models.Product).offset(offset).limit(page_size).all()
+# Insert or update Products by name in one statement
+def upsert_products(db: Session, rows: list[dict]) -> int:
+    stmt = pg_insert(models.Product)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Product.name],
+        set_={
+            "description": stmt.excluded.description,
+            "price": stmt.excluded.price,
+            "stock": stmt.excluded.stock,
+            "is_available": stmt.excluded.is_available,
+            "updated_at": func.now(),
+            "version": models.catalog_version_seq.next_value(),
+        },
+    )
+    try:
+        db.execute(stmt, rows)
+        catalog_cache.bump_catalog_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    catalog_cache.versions.clear()
+    return len(rows)
 
-    if not products:
-        raise HTTPException(status_code=404, detail="No products found.")
+# List Products
+def list_products(db: Session, cursor: Optional[str] = None, page_size: int = 10) -> dict:
+    return pagination.paginate(db.query(models.Product), models.Product, cursor, page_size)
 
-    return products
 # Search Products
+SORT_COLUMNS = {
+    schemas.SortByEnum.name: models.Product.name,
+    schemas.SortByEnum.price: models.Product.price,
+    schemas.SortByEnum.created_at: models.Product.created_at,
+}
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
 def search_products(db: Session, filter_query: schemas.ProductSearchParams):
     name = filter_query.name
     min_price = filter_query.min_price
@@ -77,4 +144,32 @@ def search_products(db: Session, filter_query: schemas.ProductSearchParams):
     page_size = filter_query.page_size
     sort_by = filter_query.sort_by
     sort_order = filter_query.sort_order
-    pass
\ No newline at end of file
+
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price.")
+
+    query = db.query(models.Product)
+
+    if name:
+        pattern = _like_pattern(name)
+        query = query.filter(
+            or_(
+                models.Product.name.ilike(pattern, escape="\\"),
+                models.Product.description.ilike(pattern, escape="\\"),
+            )
+        )
+    if is_available is not None:
+        query = query.filter(models.Product.is_available == is_available)
+    if min_price is not None:
+        query = query.filter(models.Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(models.Product.price <= max_price)
+
+    sort_column = SORT_COLUMNS[sort_by]
+    if sort_order == schemas.SortOrderEnum.desc:
+        query = query.order_by(sort_column.desc(), models.Product.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), models.Product.id.asc())
+
+    offset = (page - 1) * page_size
+    return query.offset(offset).limit(page_size).all()
@@ -0,0 +1,225 @@
+"""Daily sales rollups, maintained from the order events in the outbox.
+
+daily_product_sales counts units and revenue of every order that is not
+canceled. daily_status_sales counts orders and revenue per current status.
+Both are bucketed by the UTC day the order was placed.
+
+The order write paths never touch these tables: ``apply_order_events`` folds
+each outbox batch into one net delta per row and applies them in a fixed
+order, so checkouts do not queue on the shared (today, pending) row and the
+rollups trail the orders by the dispatcher's poll interval. With
+OUTBOX_DISPATCHER_ENABLED=false in every worker nothing applies the events and
+the rollups stop moving until a dispatcher runs again (or a backfill).
+
+Rebuild them from history with:
+
+    python -m app.services.rollups backfill [--since YYYY-MM-DD]
+"""
+import argparse
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+from uuid import UUID
+from sqlalchemy import Date, cast, delete, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from .. import models
+from . import outbox
+from .status_registry import registry
+
+ROLLUP_EVENTS = (outbox.ORDER_CREATED, outbox.ORDER_STATUS_CHANGED, outbox.ORDER_CANCELED)
+
+
+def _order_day(column):
+    return cast(func.timezone("UTC", column), Date)
+
+
+def _upsert(db: Session, table, key_columns: tuple, delta_columns: tuple, deltas: dict) -> None:
+    """Add ``deltas`` (key -> values of ``delta_columns``) to ``table`` in one statement."""
+    rows = [
+        dict(zip(key_columns + delta_columns, key + tuple(delta)))
+        for key, delta in sorted(deltas.items())
+        if any(delta)
+    ]
+    if not rows:
+        return
+    stmt = pg_insert(table).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: getattr(table, column) + getattr(stmt.excluded, column) for column in delta_columns},
+        )
+    )
+
+
+def _line_deltas(db: Session, signs: dict[UUID, tuple[date, int]]) -> list[tuple[date, UUID, int, Decimal]]:
+    """(day, product_id, quantity, revenue) of the given orders' lines, times each order's sign."""
+    lines = db.execute(
+        select(
+            models.OrderProduct.order_id,
+            models.OrderProduct.product_id,
+            models.OrderProduct.quantity,
+            func.coalesce(models.OrderProduct.unit_price, models.Product.price, 0),
+        )
+        .outerjoin(models.Product, models.Product.id == models.OrderProduct.product_id)
+        .where(models.OrderProduct.order_id.in_(list(signs)), models.OrderProduct.product_id.isnot(None))
+    ).all()
+    deltas = []
+    for order_id, product_id, quantity, price in lines:
+        day, sign = signs[order_id]
+        deltas.append((day, product_id, sign * quantity, sign * quantity * Decimal(str(price))))
+    return deltas
+
+
+@outbox.handler(*ROLLUP_EVENTS)
+def apply_order_events(db: Session, events: list[models.OutboxEvent]) -> None:
+    products: dict[tuple, list] = defaultdict(lambda: [0, Decimal(0)])
+    statuses: dict[tuple, list] = defaultdict(lambda: [0, Decimal(0)])
+    canceled_id = registry.get_id(db, "canceled")
+    # order id -> (day, +1 when it leaves canceled / -1 when it enters it)
+    line_signs: dict[UUID, tuple[date, int]] = {}
+
+    def bump_status(day: date, status_id: Optional[str], sign: int, revenue: Decimal):
+        if status_id is not None:
+            delta = statuses[(day, UUID(status_id))]
+            delta[0] += sign
+            delta[1] += sign * revenue
+
+    for event in events:
+        payload = event.payload
+        day = date.fromisoformat(payload["day"])
+        revenue = Decimal(payload["total_price"])
+        if event.event_type == outbox.ORDER_CREATED:
+            bump_status(day, payload["status_id"], 1, revenue)
+            for line in payload["products"]:
+                delta = products[(day, UUID(line["product_id"]))]
+                delta[0] += line["quantity"]
+                delta[1] += line["quantity"] * Decimal(line["unit_price"])
+            continue
+
+        bump_status(day, payload["from_status_id"], -1, revenue)
+        bump_status(day, payload["to_status_id"], 1, revenue)
+        was_canceled = canceled_id is not None and payload["from_status_id"] == str(canceled_id)
+        is_canceled = canceled_id is not None and payload["to_status_id"] == str(canceled_id)
+        if was_canceled != is_canceled:
+            order_id = UUID(payload["order_id"])
+            _, sign = line_signs.get(order_id, (day, 0))
+            line_signs[order_id] = (day, sign + (1 if was_canceled else -1))
+
+    line_signs = {order_id: entry for order_id, entry in line_signs.items() if entry[1]}
+    if line_signs:
+        for day, product_id, quantity, line_revenue in _line_deltas(db, line_signs):
+            delta = products[(day, product_id)]
+            delta[0] += quantity
+            delta[1] += line_revenue
+
+    # Always products before statuses, each sorted by key, so concurrent dispatchers lock in the same order
+    _upsert(db, models.DailyProductSales, ("day", "product_id"), ("quantity", "revenue"), products)
+    _upsert(db, models.DailyStatusSales, ("day", "status_id"), ("order_count", "revenue"), statuses)
+
+
+def backfill(db: Session, since: Optional[date] = None) -> None:
+    """Rebuild both rollups from orders and order_product, optionally from ``since`` onwards.
+
+    Runs on a single snapshot. Order events for the rebuilt days that are still
+    in the outbox are marked processed in the same transaction, because the
+    rebuilt totals already include them.
+    """
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    day = _order_day(models.Order.created_at)
+
+    undelivered = update(models.OutboxEvent).where(
+        models.OutboxEvent.event_type.in_(ROLLUP_EVENTS),
+        models.OutboxEvent.processed_at.is_(None),
+        models.OutboxEvent.failed_at.is_(None),
+    )
+    if since is not None:
+        undelivered = undelivered.where(models.OutboxEvent.payload["day"].as_string() >= since.isoformat())
+    db.execute(undelivered.values(processed_at=func.now()))
+    canceled_id = registry.get_id(db, "canceled")
+
+    product_delete = delete(models.DailyProductSales)
+    status_delete = delete(models.DailyStatusSales)
+    if since is not None:
+        product_delete = product_delete.where(models.DailyProductSales.day >= since)
+        status_delete = status_delete.where(models.DailyStatusSales.day >= since)
+    db.execute(product_delete)
+    db.execute(status_delete)
+
+    line_price = func.coalesce(models.OrderProduct.unit_price, models.Product.price, 0)
+    product_rows = (
+        select(
+            day,
+            models.OrderProduct.product_id,
+            func.sum(models.OrderProduct.quantity),
+            func.sum(models.OrderProduct.quantity * line_price),
+        )
+        .join(models.Order, models.Order.id == models.OrderProduct.order_id)
+        .outerjoin(models.Product, models.Product.id == models.OrderProduct.product_id)
+        .where(models.OrderProduct.product_id.isnot(None))
+        .group_by(day, models.OrderProduct.product_id)
+    )
+    if canceled_id is not None:
+        product_rows = product_rows.where(models.Order.status_id.is_distinct_from(canceled_id))
+
+    status_rows = (
+        select(day, models.Order.status_id, func.count(), func.coalesce(func.sum(models.Order.total_price), literal(0)))
+        .where(models.Order.status_id.isnot(None))
+        .group_by(day, models.Order.status_id)
+    )
+    if since is not None:
+        product_rows = product_rows.where(day >= since)
+        status_rows = status_rows.where(day >= since)
+
+    db.execute(
+        insert(models.DailyProductSales).from_select(["day", "product_id", "quantity", "revenue"], product_rows)
+    )
+    db.execute(
+        insert(models.DailyStatusSales).from_select(["day", "status_id", "order_count", "revenue"], status_rows)
+    )
+    db.commit()
+
+
+def get_product_sales(db: Session, start: date, end: date, product_id: Optional[UUID] = None):
+    query = db.query(models.DailyProductSales).filter(
+        models.DailyProductSales.day >= start, models.DailyProductSales.day <= end
+    )
+    if product_id is not None:
+        query = query.filter(models.DailyProductSales.product_id == product_id)
+    return query.order_by(models.DailyProductSales.day, models.DailyProductSales.product_id).all()
+
+
+def get_status_sales(db: Session, start: date, end: date) -> list[dict]:
+    rows = (
+        db.query(models.DailyStatusSales)
+        .filter(models.DailyStatusSales.day >= start, models.DailyStatusSales.day <= end)
+        .order_by(models.DailyStatusSales.day)
+        .all()
+    )
+    return [
+        {
+            "day": row.day,
+            "status": registry.get_name(db, row.status_id),
+            "order_count": row.order_count,
+            "revenue": row.revenue,
+        }
+        for row in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sales rollup maintenance.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subcommands.add_parser("backfill", help="Rebuild the rollups from order history.")
+    backfill_parser.add_argument("--since", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    from ..database import SessionLocal
+
+    with SessionLocal() as db:
+        backfill(db, since=args.since)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import threading
+import time
+from typing import Optional
+from uuid import UUID
+from sqlalchemy.orm import Session
+from .. import models
+from ..api.auth_utlis import settings
+
+
+class StatusRegistry:
+    """Process-local name <-> id map of the order_status table.
+
+    Loaded once and kept until invalidated by a status write in this process.
+    With a TTL the map is also reloaded periodically, so workers that did not
+    see a write converge. Without an explicit ``ttl`` STATUS_CACHE_TTL_SECONDS
+    is used.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._ids_by_name: dict[str, UUID] = {}
+        self._names_by_id: dict[UUID, str] = {}
+        self._loaded_at: Optional[float] = None
+
+    def load(self, db: Session) -> None:
+        statuses = db.query(models.OrderStatus.id, models.OrderStatus.name).all()
+        with self._lock:
+            self._ids_by_name = {name: status_id for status_id, name in statuses}
+            self._names_by_id = {status_id: name for status_id, name in statuses}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        ttl = self._ttl if self._ttl is not None else settings.STATUS_CACHE_TTL_SECONDS
+        return ttl is not None and time.monotonic() - self._loaded_at > ttl
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if self._is_stale():
+            self.load(db)
+
+    def get_id(self, db: Session, name: str) -> Optional[UUID]:
+        self._ensure_loaded(db)
+        return self._ids_by_name.get(name)
+
+    def items(self, db: Session) -> list[tuple[str, UUID]]:
+        self._ensure_loaded(db)
+        return list(self._ids_by_name.items())
+
+    def get_name(self, db: Session, status_id: UUID) -> Optional[str]:
+        self._ensure_loaded(db)
+        name = self._names_by_id.get(status_id)
+        if name is None and status_id is not None:
+            # Created by another worker since the last load
+            self.load(db)
+            name = self._names_by_id.get(status_id)
+        return name
+
+
+registry = StatusRegistry()
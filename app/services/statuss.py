@@ -1,21 +1,23 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app import models, schemas
+from app.services.status_registry import registry
 
 def create_status(db: Session, status_data: schemas.StatusCreate):
     # Check if the status already exists
-    existing_status = db.query(models.Status).filter(models.Status.name == status_data.name).first()
+    existing_status = db.query(models.OrderStatus).filter(models.OrderStatus.name == status_data.name).first()
     if existing_status:
         raise HTTPException(status_code=400, detail="Status name must be unique.")
-    new_status = models.Status(name=status_data.name)
+    new_status = models.OrderStatus(name=status_data.name)
     db.add(new_status)
     db.commit()
     db.refresh(new_status)
+    registry.invalidate()
     return new_status
 
 def get_status_by_id(db: Session, status_id: str):
     # Retrieve the status by ID
-    status = db.query(models.Status).filter(models.Status.id == status_id).first()
+    status = db.query(models.OrderStatus).filter(models.OrderStatus.id == status_id).first()
     if not status:
         raise HTTPException(status_code=404, detail="Status not found")
     return status
@@ -25,12 +27,13 @@ def update_status(db: Session, status_id: str, status_update: schemas.StatusUpda
     status = get_status_by_id(db, status_id)
     
     # Check if another status with the same name exists
-    existing_status = db.query(models.Status).filter(models.Status.name == status_update.name, models.Status.id != status_id).first()
+    existing_status = db.query(models.OrderStatus).filter(models.OrderStatus.name == status_update.name, models.OrderStatus.id != status_id).first()
     if existing_status:
         raise HTTPException(status_code=400, detail="Status name must be unique.")
     status.name = status_update.name
     db.commit()
     db.refresh(status)
+    registry.invalidate()
     return status
 
 def delete_status(db: Session, status_id: str):
@@ -43,4 +46,5 @@ def delete_status(db: Session, status_id: str):
         raise HTTPException(status_code=400, detail="Cannot delete status. It is currently in use by an order.")
     
     db.delete(status)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    registry.invalidate()
\ No newline at end of file
@@ -3,8 +3,8 @@ from fastapi import HTTPException, status
 from sqlalchemy import UUID
 from sqlalchemy.orm import Session
 from .. import models, schemas
-from api.auth_utlis import get_password_hash
-from app.services import order_service
+from app.api import principal_cache
+from app.services import order_service, pagination
 
 
 def get_user_by_username(username: str, db: Session) -> models.User | None:
@@ -13,6 +13,14 @@ def get_user_by_username(username: str, db: Session) -> models.User | None:
 def get_user_by_id(user_id: str, db: Session) -> models.User | None:
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+def get_principal(user_id: UUID, db: Session) -> schemas.Principal | None:
+    row = (
+        db.query(models.User.id, models.User.is_active, models.User.is_admin)
+        .filter(models.User.id == user_id)
+        .first()
+    )
+    return schemas.Principal.model_validate(row) if row else None
+
 def find_user_by_email_and_id(email: str, exclude_user_id: str, db: Session) -> models.User | None:
     return (
         db.query(models.User)
@@ -20,13 +28,13 @@ def find_user_by_email_and_id(email: str, exclude_user_id: str, db: Session) ->
         .first()
     )
     
-async def create_user(db: Session, user: schemas.UserCreateRequestModel) -> schemas.UserCreateResponseModel:
+# Passwords arrive already hashed: bcrypt runs on the password pool before the route enters run_db
+def create_user(db: Session, user: schemas.UserCreateRequestModel, hashed_password: str) -> schemas.UserCreateResponseModel:
     # Check if the email already exists
     existing_user = db.query(models.User).filter(models.User.email == user.email).first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered.")
     
-    hashed_password = get_password_hash(user.password)
     new_user = models.User(
         username=user.username,
         email=user.email,
@@ -56,7 +64,8 @@ def get_user_by_id(user_id: UUID, db: Session) -> models.User:
 def update_user_in_db(
     user_id: UUID, 
     update_data: schemas.UserUpdateRequestModel, 
-    db: Session) -> models.User:
+    db: Session,
+    hashed_password: str | None = None) -> models.User:
 
     user = db.query(models.User).filter(models.User.id == user_id).first()
     if not user:
@@ -74,12 +83,13 @@ def update_user_in_db(
             )
         user.email = update_data.email
 
-    if update_data.password:
-        user.hashed_password = get_password_hash(update_data.password)
+    if hashed_password:
+        user.hashed_password = hashed_password
 
     user.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate_user(user_id)
 
     return user
 
@@ -98,14 +108,12 @@ def delete_user_from_db(user_id: UUID, db: Session) -> None:
         )
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
 
 
-def get_all_users(db: Session) -> list[schemas.GetUserResponseModel]:
-    users = db.query(models.User).all()
-    if not users:
-        return []
-
-    return [schemas.GetUserResponseModel.model_validate(user) for user in users]
+def get_all_users(db: Session, cursor: str | None = None, page_size: int = 10) -> schemas.UserPage:
+    page = pagination.paginate(db.query(models.User), models.User, cursor, page_size)
+    return schemas.UserPage.model_validate(page)
 
 
 def change_user_role(user_id: UUID, is_admin: bool, db: Session) -> None:
@@ -115,5 +123,6 @@ def change_user_role(user_id: UUID, is_admin: bool, db: Session) -> None:
 
     user.is_admin = is_admin
     db.commit()
+    principal_cache.invalidate_user(user_id)
 
 
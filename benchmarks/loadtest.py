@@ -0,0 +1,283 @@
+"""Load test and latency benchmark for the API.
+
+Drives the real FastAPI app, either in-process through httpx's ASGI
+transport (the default) or against a running server with --base-url, and
+writes a JSON report with p50/p95/p99 latency, throughput, error counts
+and DB queries per request for each scenario.
+
+    python -m benchmarks.loadtest --output before.json
+    python -m benchmarks.loadtest --output after.json --compare before.json
+
+In-process runs seed their own admin user and products into DATABASE_URL.
+Against a server pass --username/--password of an existing admin user.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from typing import Optional
+
+import httpx
+from jose import jwt
+
+API = "/api/v1"
+BENCH_PASSWORD = "Bench-Passw0rd!"
+SCENARIOS = ["login", "product_list", "product_search", "create_order", "order_history"]
+# Orders are created as pending; the rest are seeded so status updates work too
+ORDER_STATUSES = ["pending", "processing", "shipped", "completed", "canceled"]
+
+
+class QueryCounter:
+    """Counts statements on every engine in this process (in-process mode only)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def install(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        @event.listens_for(Engine, "before_cursor_execute")
+        def count(conn, cursor, statement, parameters, context, executemany):
+            self.count += 1
+
+
+class Context:
+    def __init__(self, client: httpx.AsyncClient, username: str, password: str):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.token: Optional[str] = None
+        self.user_id: Optional[str] = None
+        self.product_ids: list[str] = []
+
+    @property
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def login(self) -> httpx.Response:
+        return await self.client.post(
+            f"{API}/login/login", data={"username": self.username, "password": self.password}
+        )
+
+
+async def scenario_login(ctx: Context) -> httpx.Response:
+    return await ctx.login()
+
+async def scenario_product_list(ctx: Context) -> httpx.Response:
+    return await ctx.client.get(f"{API}/products", params={"page_size": 20})
+
+async def scenario_product_search(ctx: Context) -> httpx.Response:
+    term = random.choice(["bench", "widget", "lamp", "cable"])
+    return await ctx.client.get(
+        f"{API}/products/search",
+        params={"name": term, "is_available": True, "sort_by": "price", "page_size": 20},
+    )
+
+async def scenario_create_order(ctx: Context) -> httpx.Response:
+    items = random.sample(ctx.product_ids, min(5, len(ctx.product_ids)))
+    body = {"products": [{"product_id": product_id, "quantity": 1} for product_id in items]}
+    return await ctx.client.post(f"{API}/orders/orders/", json=body, headers=ctx.auth)
+
+async def scenario_order_history(ctx: Context) -> httpx.Response:
+    return await ctx.client.get(
+        f"{API}/users/users/{ctx.user_id}/orders", params={"page_size": 20}, headers=ctx.auth
+    )
+
+RUNNERS = {
+    "login": scenario_login,
+    "product_list": scenario_product_list,
+    "product_search": scenario_product_search,
+    "create_order": scenario_create_order,
+    "order_history": scenario_order_history,
+}
+
+
+def seed_in_process(products: int) -> tuple[str, str]:
+    from sqlalchemy import insert
+    from app import models
+    from app.api.auth_utlis import get_password_hash
+    from app.database import SessionLocal
+    from app.services.status_registry import registry
+
+    username = f"bench-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        existing = {name for (name,) in db.query(models.OrderStatus.name)}
+        db.add_all(models.OrderStatus(name=name) for name in ORDER_STATUSES if name not in existing)
+        db.add(
+            models.User(
+                username=username,
+                email=f"{username}@bench.example.com",
+                hashed_password=get_password_hash(BENCH_PASSWORD),
+                is_admin=True,
+                is_active=True,
+            )
+        )
+        db.execute(
+            insert(models.Product),
+            [
+                {
+                    "name": f"bench widget {username} {i}",
+                    "description": "benchmark product",
+                    "price": round(random.uniform(1, 100), 2),
+                    "stock": 1_000_000,
+                    "is_available": True,
+                }
+                for i in range(products)
+            ],
+        )
+        db.commit()
+    registry.invalidate()
+    return username, BENCH_PASSWORD
+
+
+def percentile(samples: list[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+async def run_scenario(ctx: Context, name: str, requests: int, concurrency: int, counter: Optional[QueryCounter]) -> dict:
+    runner = RUNNERS[name]
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    header_queries: list[int] = []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await runner(ctx)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if "X-DB-Queries" in response.headers:
+                header_queries.append(int(response.headers["X-DB-Queries"]))
+
+    queries_before = counter.count if counter else 0
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    if not latencies:
+        return {"requests": 0, "concurrency": concurrency}
+
+    if counter is not None:
+        queries_per_request = (counter.count - queries_before) / requests
+    elif header_queries:
+        queries_per_request = statistics.mean(header_queries)
+    else:
+        queries_per_request = None
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_per_s": requests / elapsed,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": statistics.mean(latencies),
+        "errors": errors,
+        "status_codes": statuses,
+        "db_queries_per_request": queries_per_request,
+    }
+
+
+async def run(args) -> dict:
+    counter = None
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        username, password = args.username, args.password
+    else:
+        from app.main import app
+
+        counter = QueryCounter()
+        counter.install()
+        username, password = seed_in_process(args.products)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout)
+
+    async with client:
+        ctx = Context(client, username, password)
+        response = await ctx.login()
+        response.raise_for_status()
+        ctx.token = response.json()["access_token"]
+        ctx.user_id = jwt.get_unverified_claims(ctx.token)["sub"]
+
+        page = await client.get(f"{API}/products", params={"page_size": 100})
+        page.raise_for_status()
+        ctx.product_ids = [product["id"] for product in page.json()["items"] if product["is_available"]]
+
+        results = {}
+        for name in args.scenarios:
+            if args.warmup:
+                await run_scenario(ctx, name, min(args.warmup, args.requests), args.concurrency, None)
+            results[name] = await run_scenario(ctx, name, args.requests, args.concurrency, counter)
+
+    return {
+        "mode": "server" if args.base_url else "in-process",
+        "target": args.base_url or "app.main:app",
+        "timestamp": time.time(),
+        "scenarios": results,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> bool:
+    """Print per-scenario deltas against ``baseline``; False if any p95 or throughput regressed too far."""
+    ok = True
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or not previous.get("requests") or not current.get("requests"):
+            continue
+        p95_change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"]
+        throughput_change = (current["throughput_per_s"] - previous["throughput_per_s"]) / previous["throughput_per_s"]
+        regressed = p95_change > max_regression or throughput_change < -max_regression
+        ok = ok and not regressed
+        print(
+            f"{name:16} p95 {previous['p95_ms']:8.2f} -> {current['p95_ms']:8.2f} ms ({p95_change:+.1%})  "
+            f"throughput {previous['throughput_per_s']:8.1f} -> {current['throughput_per_s']:8.1f}/s ({throughput_change:+.1%})"
+            f"{'  REGRESSION' if regressed else ''}",
+            file=sys.stderr,
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app.")
+    parser.add_argument("--username", help="Existing admin user (server mode).")
+    parser.add_argument("--password", help="Password of --username (server mode).")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario.")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--products", type=int, default=200, help="Products to seed (in-process mode).")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    parser.add_argument("--compare", help="Baseline report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed relative p95/throughput regression.")
+    args = parser.parse_args()
+
+    if args.base_url and not (args.username and args.password):
+        parser.error("--username and --password are required with --base-url")
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Password verification throughput for bcrypt rounds x pool size.
+
+Runs a burst of concurrent verifications through PasswordPool for every
+combination of --rounds and --workers and reports verifications/second,
+latency percentiles and how many requests were shed with a 503. Use it to
+pick BCRYPT_ROUNDS, PASSWORD_POOL_WORKERS and PASSWORD_POOL_MAX_QUEUE.
+
+    python -m benchmarks.login_throughput --rounds 10 12 --workers 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import time
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.api.password_pool import PasswordPool
+
+
+async def run_burst(pool: PasswordPool, context: CryptContext, hashed: str, requests: int) -> dict:
+    latencies = []
+    rejected = 0
+
+    async def one():
+        nonlocal rejected
+        start = time.perf_counter()
+        try:
+            await pool.run(context.verify, "Password1!", hashed)
+        except HTTPException:
+            rejected += 1
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] if latencies else None
+
+    return {
+        "completed": len(latencies),
+        "rejected": rejected,
+        "throughput_per_s": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    report = []
+    for rounds in args.rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        hashed = context.hash("Password1!")
+        for workers in args.workers:
+            pool = PasswordPool(workers=workers, max_queue=args.max_queue)
+            result = asyncio.run(run_burst(pool, context, hashed, args.requests))
+            report.append({"rounds": rounds, "workers": workers, "max_queue": args.max_queue, **result})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Product search latency as the catalog grows.
+
+Seeds the products table up to each target size and times a fixed set of
+searches at every step. With the trigram and (is_available, price) indexes
+in place the per-query latency should stay roughly flat between steps.
+
+    python -m benchmarks.product_search --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from sqlalchemy import func, insert
+
+from app import models, schemas
+from app.database import SessionLocal
+from app.services import products
+
+SEARCHES = [
+    schemas.ProductSearchParams(name="widget"),
+    schemas.ProductSearchParams(name="blue", is_available=True, sort_by="price"),
+    schemas.ProductSearchParams(min_price=10, max_price=20, is_available=True),
+    schemas.ProductSearchParams(min_price=500, sort_by="price", sort_order="desc"),
+    schemas.ProductSearchParams(name="zzz-no-match"),
+]
+
+WORDS = ["red", "blue", "green", "steel", "widget", "gadget", "lamp", "chair", "cable", "mug"]
+
+
+def seed(db, target: int, batch_size: int = 10000):
+    current = db.query(func.count(models.Product.id)).scalar()
+    while current < target:
+        count = min(batch_size, target - current)
+        db.execute(
+            insert(models.Product),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "name": f"{' '.join(random.sample(WORDS, 3))} {current + i}",
+                    "description": " ".join(random.choices(WORDS, k=8)),
+                    "price": round(random.uniform(1, 1000), 2),
+                    "stock": random.randint(0, 500),
+                    "is_available": random.random() < 0.8,
+                }
+                for i in range(count)
+            ],
+        )
+        db.commit()
+        current += count
+
+
+def time_searches(db, repeat: int) -> dict:
+    results = {}
+    for params in SEARCHES:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            products.search_products(db, params)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        results[params.model_dump_json(exclude_defaults=True)] = {
+            "p50_ms": statistics.median(samples),
+            "p95_ms": samples[int(len(samples) * 0.95) - 1],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    report = {}
+    with SessionLocal() as db:
+        for size in sorted(args.sizes):
+            seed(db, size)
+            db.connection().exec_driver_sql("ANALYZE products")
+            db.commit()
+            report[size] = time_searches(db, args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
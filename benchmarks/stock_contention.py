@@ -0,0 +1,98 @@
+"""Flash-sale stress test: many concurrent orders against one product.
+
+Creates a product with --stock units, then places --orders single-unit
+orders for it from --concurrency threads, each with its own session, through
+order_service.create_order. Reports throughput and outcomes, and exits
+non-zero if more units were sold than existed or the final stock does not
+match the number of successful orders.
+
+    python -m benchmarks.stock_contention --stock 1000 --orders 5000 --concurrency 64
+"""
+import argparse
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+from app import models, schemas
+from app.api.auth_utlis import get_password_hash
+from app.database import SessionLocal
+from app.services import order_service
+
+
+def setup(stock: int) -> tuple[uuid.UUID, uuid.UUID]:
+    with SessionLocal() as db:
+        if not db.query(models.OrderStatus).filter(models.OrderStatus.name == "pending").first():
+            db.add(models.OrderStatus(name="pending"))
+        suffix = uuid.uuid4().hex[:8]
+        user = models.User(
+            username=f"stress-{suffix}",
+            email=f"stress-{suffix}@bench.example.com",
+            hashed_password=get_password_hash("Stress-Passw0rd!"),
+        )
+        product = models.Product(name=f"flash sale {suffix}", price=9.99, stock=stock, is_available=True)
+        db.add_all([user, product])
+        db.commit()
+        return user.id, product.id
+
+
+def place_order(user_id: uuid.UUID, product_id: uuid.UUID) -> str:
+    request = schemas.OrderCreateRequest(products=[schemas.ProductOrder(product_id=product_id, quantity=1)])
+    with SessionLocal() as db:
+        try:
+            order_service.create_order(db, user_id, request)
+            return "created"
+        except HTTPException as e:
+            return f"http_{e.status_code}"
+        except Exception as e:
+            return type(e).__name__
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    user_id, product_id = setup(args.stock)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(lambda _: place_order(user_id, product_id), range(args.orders)))
+    elapsed = time.perf_counter() - start
+
+    counts: dict[str, int] = {}
+    for outcome in outcomes:
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    with SessionLocal() as db:
+        final_stock = db.get(models.Product, product_id).stock
+        sold = (
+            db.query(models.OrderProduct)
+            .filter(models.OrderProduct.product_id == product_id)
+            .count()
+        )
+
+    created = counts.get("created", 0)
+    oversold = max(sold - args.stock, 0)
+    consistent = final_stock == args.stock - sold and sold == created and final_stock >= 0
+    print(json.dumps({
+        "stock": args.stock,
+        "orders": args.orders,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "orders_per_s": args.orders / elapsed,
+        "outcomes": counts,
+        "units_sold": sold,
+        "final_stock": final_stock,
+        "oversold": oversold,
+        "consistent": consistent,
+    }, indent=2))
+    if oversold or not consistent:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
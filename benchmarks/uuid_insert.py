@@ -0,0 +1,91 @@
+"""Insert throughput and primary-key index size: uuid4 versus uuid7.
+
+Creates two scratch tables shaped like order_product (uuid primary key plus a
+few columns), fills each with --rows rows in --batch-size batches using one of
+the generators, and reports rows/s, the size of the primary-key index and its
+leaf density from pgstattuple when that extension is available. The tables are
+dropped afterwards unless --keep is given.
+
+    python -m benchmarks.uuid_insert --rows 2000000 --batch-size 5000
+"""
+import argparse
+import json
+import time
+import uuid
+from sqlalchemy import Column, Integer, MetaData, Numeric, Table, insert, text
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.database import get_engine
+from app.ids import uuid7
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+metadata = MetaData()
+
+
+def scratch_table(name: str) -> Table:
+    return Table(
+        f"bench_pk_{name}",
+        metadata,
+        Column("id", UUID(as_uuid=True), primary_key=True),
+        Column("quantity", Integer, nullable=False),
+        Column("unit_price", Numeric(10, 2), nullable=False),
+    )
+
+
+def index_stats(conn, table: Table) -> dict:
+    index_name = f"{table.name}_pkey"
+    stats = {
+        "index_bytes": conn.execute(text("SELECT pg_relation_size(:name)"), {"name": index_name}).scalar(),
+        "table_bytes": conn.execute(text("SELECT pg_relation_size(:name)"), {"name": table.name}).scalar(),
+    }
+    try:
+        with conn.begin_nested():
+            stats["avg_leaf_density"] = conn.execute(
+                text("SELECT avg_leaf_density FROM pgstatindex(:name)"), {"name": index_name}
+            ).scalar()
+    except Exception:
+        # pgstattuple is optional
+        stats["avg_leaf_density"] = None
+    return stats
+
+
+def run(name: str, rows: int, batch_size: int, keep: bool) -> dict:
+    generate = GENERATORS[name]
+    table = scratch_table(name)
+    engine = get_engine()
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    start = time.perf_counter()
+    inserted = 0
+    while inserted < rows:
+        count = min(batch_size, rows - inserted)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(table),
+                [{"id": generate(), "quantity": 1, "unit_price": 9.99} for _ in range(count)],
+            )
+        inserted += count
+    elapsed = time.perf_counter() - start
+
+    with engine.begin() as conn:
+        stats = index_stats(conn, table)
+    if not keep:
+        table.drop(engine)
+    return {"generator": name, "rows": rows, "elapsed_s": elapsed, "rows_per_s": rows / elapsed, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--keep", action="store_true", help="leave the scratch tables in place")
+    args = parser.parse_args()
+
+    results = [run(name, args.rows, args.batch_size, args.keep) for name in GENERATORS]
+    print(json.dumps(results, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import uuid
+from app import models
+from app.services.status_registry import registry
+
+
+def make_user(db) -> models.User:
+    suffix = uuid.uuid4().hex[:8]
+    user = models.User(
+        username=f"test-{suffix}",
+        email=f"test-{suffix}@example.com",
+        hashed_password="not-a-real-hash",
+        is_admin=False,
+        is_active=True,
+    )
+    db.add(user)
+    db.flush()
+    return user
+
+
+def make_products(db, count: int, price: float = 5.0, stock: int = 100) -> list[models.Product]:
+    suffix = uuid.uuid4().hex[:8]
+    products = [
+        models.Product(name=f"test {suffix} {i}", price=price, stock=stock, is_available=True)
+        for i in range(count)
+    ]
+    db.add_all(products)
+    db.flush()
+    return products
+
+
+def make_orders(db, user: models.User, products: list[models.Product], count: int, status: str = "pending") -> list[models.Order]:
+    status_id = registry.get_id(db, status)
+    orders = []
+    for _ in range(count):
+        order = models.Order(user_id=user.id, status_id=status_id, total_price=sum(product.price for product in products))
+        order.products = [models.OrderProduct(product_id=product.id, quantity=1) for product in products]
+        orders.append(order)
+    db.add_all(orders)
+    db.flush()
+    return orders
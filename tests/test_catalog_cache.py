@@ -0,0 +1,24 @@
+from app import schemas
+from app.services import catalog_cache, order_service, products
+from tests.factories import make_products, make_user
+
+
+def catalog_version(db) -> int:
+    catalog_cache.versions.invalidate_catalog()
+    return catalog_cache.versions.catalog_version(db)
+
+
+def test_catalog_version_tracks_listed_fields_only(db):
+    user = make_user(db)
+    (product,) = make_products(db, 1)
+    start = catalog_version(db)
+
+    request = schemas.OrderCreateRequest(products=[schemas.ProductOrder(product_id=product.id, quantity=1)])
+    order_service.create_order(db, user.id, request)
+    products.update_product(str(product.id), schemas.ProductUpdate(stock=50), db)
+    assert catalog_version(db) == start
+
+    products.update_product(str(product.id), schemas.ProductUpdate(price="7.50"), db)
+    assert catalog_version(db) == start + 1
+    products.delete_product(str(product.id), db)
+    assert catalog_version(db) == start + 2
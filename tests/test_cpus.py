@@ -0,0 +1,28 @@
+from app import cpus
+
+
+def fake_files(monkeypatch, files: dict):
+    monkeypatch.setattr(cpus, "_read", lambda path: files.get(path))
+
+
+def test_cgroup_v2_quota_rounds_up(monkeypatch):
+    fake_files(monkeypatch, {cpus.CGROUP_V2_CPU_MAX: "150000 100000"})
+    assert cpus.cgroup_cpu_limit() == 2
+
+
+def test_cgroup_v2_without_limit(monkeypatch):
+    fake_files(monkeypatch, {cpus.CGROUP_V2_CPU_MAX: "max 100000"})
+    assert cpus.cgroup_cpu_limit() is None
+
+
+def test_cgroup_v1_quota(monkeypatch):
+    fake_files(monkeypatch, {cpus.CGROUP_V1_QUOTA: "200000", cpus.CGROUP_V1_PERIOD: "100000"})
+    assert cpus.cgroup_cpu_limit() == 2
+    fake_files(monkeypatch, {cpus.CGROUP_V1_QUOTA: "-1", cpus.CGROUP_V1_PERIOD: "100000"})
+    assert cpus.cgroup_cpu_limit() is None
+
+
+def test_available_cpus_takes_the_quota_when_smaller(monkeypatch):
+    fake_files(monkeypatch, {cpus.CGROUP_V2_CPU_MAX: "200000 100000"})
+    monkeypatch.setattr(cpus.os, "sched_getaffinity", lambda pid: set(range(64)))
+    assert cpus.available_cpus() == 2
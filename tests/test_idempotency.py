@@ -0,0 +1,31 @@
+import uuid
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import models, schemas
+from app.services import idempotency, order_service
+from tests.factories import make_products, make_user
+
+
+def test_replay_returns_stored_response_without_second_order(db):
+    user = make_user(db)
+    (product,) = make_products(db, 1)
+    request = schemas.OrderCreateRequest(products=[schemas.ProductOrder(product_id=product.id, quantity=1)])
+    key = uuid.uuid4().hex
+
+    def place_order():
+        new_order = order_service.create_order(db, user.id, request, commit=False)
+        return order_service.order_summary(new_order, db)
+
+    first = idempotency.run_idempotent(db, user.id, key, request, place_order)
+    second = idempotency.run_idempotent(db, user.id, key, request, place_order)
+
+    assert first == second
+    assert db.query(models.Order).filter(models.Order.user_id == user.id).count() == 1
+    record = db.get(models.IdempotencyKey, (user.id, key))
+    assert record.completed_at is not None and record.response_body == first
+
+
+def test_claim_reraises_integrity_errors_that_are_not_duplicates(db):
+    with pytest.raises(IntegrityError):
+        # No such user: the foreign key fails and there is no existing record to replay
+        idempotency.run_idempotent(db, uuid.uuid4(), uuid.uuid4().hex, {"a": 1}, lambda: {"ok": True})
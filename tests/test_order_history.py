@@ -0,0 +1,30 @@
+from app import models
+from app.database import track_queries
+from app.services import order_service
+from tests.factories import make_orders, make_products, make_user
+
+
+def count_history_queries(db, order_count: int) -> int:
+    user = make_user(db)
+    make_orders(db, user, make_products(db, 3), order_count)
+    user_id = user.id
+    db.expire_all()
+    with track_queries() as stats:
+        page = order_service.get_orders_for_user(str(user_id), db, page_size=order_count)
+    assert len(page["items"]) == order_count
+    assert all(len(item.products) == 3 for item in page["items"])
+    return stats.count
+
+
+def test_order_history_query_count_is_constant(db):
+    counts = {order_count: count_history_queries(db, order_count) for order_count in (1, 10, 50)}
+    assert len(set(counts.values())) == 1, f"queries per page grew with the number of orders: {counts}"
+
+
+def test_order_detail_tolerates_deleted_user(db):
+    (order,) = make_orders(db, make_user(db), make_products(db, 1), 1)
+    order.user_id = None
+    db.flush()
+
+    detail = order_service.get_order_detail(str(order.id), db)
+    assert detail.user_id is None
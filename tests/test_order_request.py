@@ -0,0 +1,8 @@
+import pytest
+from pydantic import ValidationError
+from app import schemas
+
+
+def test_empty_cart_is_rejected():
+    with pytest.raises(ValidationError):
+        schemas.OrderCreateRequest(products=[])
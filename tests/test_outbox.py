@@ -0,0 +1,46 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from app import models
+from app.services import outbox
+
+
+def events_by_key(db):
+    return {
+        event.payload["key"]: event
+        for event in db.query(models.OutboxEvent).filter(models.OutboxEvent.event_type == "test.event")
+    }
+
+
+def test_failing_event_is_retried_without_redelivering_the_rest(db, monkeypatch):
+    monkeypatch.setattr(outbox, "_handlers", defaultdict(list))
+    seen = []
+
+    @outbox.handler("test.event")
+    def record(db, events):
+        if any(event.payload["key"] == "bad" for event in events):
+            raise RuntimeError("boom")
+        seen.extend(event.payload["key"] for event in events)
+
+    outbox.enqueue_many(db, "test.event", [{"key": "a"}, {"key": "bad"}, {"key": "b"}])
+    db.flush()
+    outbox.dispatch_batch(db, 100)
+
+    events = events_by_key(db)
+    assert seen == ["a", "b"]
+    assert events["a"].processed_at is not None and events["b"].processed_at is not None
+    assert events["bad"].processed_at is None and events["bad"].attempts == 1
+    assert events["bad"].available_at > datetime.now(timezone.utc)
+
+
+def test_purge_deletes_only_old_processed_events(db):
+    now = datetime.now(timezone.utc)
+    outbox.enqueue_many(db, "test.event", [{"key": "old"}, {"key": "recent"}, {"key": "pending"}])
+    db.flush()
+    events = events_by_key(db)
+    events["old"].processed_at = now - timedelta(days=30)
+    events["recent"].processed_at = now
+    db.flush()
+
+    assert outbox.purge_processed(db, timedelta(days=7)) >= 1
+    db.expire_all()
+    assert set(events_by_key(db)) == {"recent", "pending"}
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from app.services import product_import
+
+
+def ndjson(*records):
+    async def chunks():
+        yield "".join(json.dumps(record) + "\n" for record in records).encode()
+    return chunks()
+
+
+def run_import(records, upsert_batch):
+    return asyncio.run(product_import.import_products(ndjson(*records), "application/x-ndjson", upsert_batch))
+
+
+def test_column_limits_are_checked_before_the_database():
+    written = []
+
+    async def upsert_batch(rows):
+        written.extend(rows)
+        return len(rows)
+
+    summary = run_import(
+        [
+            {"name": "ok", "price": "1.00", "stock": 1},
+            {"name": "x" * 256, "price": "1.00", "stock": 1},
+            {"name": "big", "price": "1.00", "stock": 2**31},
+        ],
+        upsert_batch,
+    )
+
+    assert [row["name"] for row in written] == ["ok"]
+    assert summary["upserted"] == 1 and summary["failed"] == 2
+    assert [error["line"] for error in summary["errors"]] == [2, 3]
+
+
+def test_rejected_batch_reports_only_the_failing_rows():
+    async def upsert_batch(rows):
+        if any(row["name"].startswith("bad") for row in rows):
+            raise RuntimeError("rejected")
+        return len(rows)
+
+    records = [{"name": f"product-{i}", "price": "1.00", "stock": 1} for i in range(10)]
+    records[3]["name"] = "bad-3"
+    records[7]["name"] = "bad-7"
+
+    summary = run_import(records, upsert_batch)
+
+    assert summary["upserted"] == 8 and summary["failed"] == 2
+    assert summary["errors"] == [
+        {"line": 4, "error": "Rejected by the database: RuntimeError: rejected"},
+        {"line": 8, "error": "Rejected by the database: RuntimeError: rejected"},
+    ]
@@ -0,0 +1,159 @@
+"""Every statement the service layer issues must be able to use an index.
+
+Each scenario drives real service functions and captures the SQL they send,
+executemany batches included (explained with their first parameter set). The
+statements are then run through EXPLAIN with sequential scans disabled: the
+planner still falls back to one when no index can serve the query, so any Seq
+Scan left in a plan is a missing or unusable index, whatever the table size.
+"""
+import uuid
+from decimal import Decimal
+import pytest
+from sqlalchemy import event
+from app import schemas
+from app.services import order_service, products, statuss, user_service
+from tests.factories import make_orders, make_products, make_user
+
+EXPLAINED_PREFIXES = ("select", "insert", "update", "delete", "with")
+# Tables read in full on purpose: the status registry loads every row of this one
+FULL_SCAN_TABLES = {"order_status"}
+
+
+def cart(product_ids, quantity=1) -> schemas.OrderCreateRequest:
+    return schemas.OrderCreateRequest(products=[
+        schemas.ProductOrder(product_id=product_id, quantity=quantity) for product_id in product_ids
+    ])
+
+
+def create_and_delete_status(db, ctx):
+    status = statuss.create_status(db, schemas.StatusCreate(name=f"plan-{uuid.uuid4().hex[:8]}"))
+    statuss.get_status_by_id(db, status.id)
+    statuss.update_status(db, status.id, schemas.StatusUpdate(name=f"plan-{uuid.uuid4().hex[:8]}"))
+    statuss.delete_status(db, status.id)
+
+
+def create_update_and_delete_product(db, ctx):
+    product = products.create_product(db, schemas.ProductCreate(name=f"plan {uuid.uuid4().hex}", price=Decimal("3.50"), stock=5))
+    product = products.update_product(str(product.id), schemas.ProductUpdate(name=f"plan {uuid.uuid4().hex}"), db)
+    products.update_product(str(product.id), schemas.ProductUpdate(price=Decimal("4.00")), db, expected_version=product.version)
+    products.delete_product(str(product.id), db)
+
+
+def create_update_and_delete_user(db, ctx):
+    request = schemas.UserCreateRequestModel(
+        username=f"plan-{uuid.uuid4().hex[:8]}", email=f"plan-{uuid.uuid4().hex[:8]}@example.com", password="Planpass1!"
+    )
+    user = user_service.create_user(db, request, hashed_password="not-a-real-hash")
+    update = schemas.UserUpdateRequestModel(email=f"plan-{uuid.uuid4().hex[:8]}@example.com", password="Planpass2!")
+    user_service.update_user_in_db(user.id, update, db, hashed_password="not-a-real-hash")
+    user_service.change_user_role(user.id, True, db)
+    user_service.delete_user_from_db(user.id, db)
+
+
+def upsert_products(db, ctx):
+    rows = [
+        {"name": product.name, "description": None, "price": 2.0, "stock": 3, "is_available": True}
+        for product in ctx["products"]
+    ]
+    products.upsert_products(db, rows + [{"name": f"plan {uuid.uuid4().hex}", "description": None, "price": 1.0, "stock": 1, "is_available": True}])
+
+
+def first_two_pages(list_page):
+    def scenario(db, ctx):
+        page = list_page(db, ctx, None)
+        list_page(db, ctx, page["next_cursor"] if isinstance(page, dict) else page.next_cursor)
+    return scenario
+
+
+SCENARIOS = {
+    "order_service.has_active_orders": lambda db, ctx: order_service.has_active_orders(ctx["user"].id, db),
+    "order_service.get_product_by_id": lambda db, ctx: order_service.get_product_by_id(ctx["product_ids"][0], db),
+    "order_service.update_product_stock": lambda db, ctx: order_service.update_product_stock(ctx["product_ids"][0], 1, db),
+    "order_service.create_order": lambda db, ctx: order_service.create_order(db, ctx["user"].id, cart(ctx["product_ids"])),
+    "order_service.get_order_by_id": lambda db, ctx: order_service.get_order_by_id(ctx["order_id"], db, lock=True),
+    "order_service.get_order_detail": lambda db, ctx: order_service.get_order_detail(ctx["order_id"], db),
+    "order_service.get_orders_for_user": first_two_pages(
+        lambda db, ctx, cursor: order_service.get_orders_for_user(ctx["user"].id, db, cursor=cursor, page_size=2)
+    ),
+    "order_service.update_order_status": lambda db, ctx: order_service.update_order_status(ctx["order_id"], "shipped", db),
+    "order_service.bulk_update_order_status": lambda db, ctx: order_service.bulk_update_order_status(
+        ctx["order_ids"] + [uuid.uuid4()], "processing", db
+    ),
+    "order_service.cancel_order": lambda db, ctx: order_service.cancel_order(ctx["order_id"], db),
+    "products.create+update+delete": create_update_and_delete_product,
+    "products.get_product_by_id": lambda db, ctx: products.get_product_by_id(ctx["product_ids"][0], db),
+    "products.get_products_by_ids": lambda db, ctx: products.get_products_by_ids(db, ctx["product_ids"] + [uuid.uuid4()]),
+    "products.upsert_products": upsert_products,
+    "products.list_products": first_two_pages(lambda db, ctx, cursor: products.list_products(db, cursor=cursor, page_size=2)),
+    "products.search_products(price)": lambda db, ctx: products.search_products(
+        db, schemas.ProductSearchParams(is_available=True, min_price=10, max_price=20, sort_by="price")
+    ),
+    "products.search_products(name)": lambda db, ctx: products.search_products(db, schemas.ProductSearchParams(name="plan 123")),
+    "user_service.get_user_by_username": lambda db, ctx: user_service.get_user_by_username(ctx["user"].username, db),
+    "user_service.get_user_by_id": lambda db, ctx: user_service.get_user_by_id(ctx["user"].id, db),
+    "user_service.get_principal": lambda db, ctx: user_service.get_principal(ctx["user"].id, db),
+    "user_service.find_user_by_email_and_id": lambda db, ctx: user_service.find_user_by_email_and_id(ctx["user"].email, ctx["user"].id, db),
+    "user_service.create+update+delete": create_update_and_delete_user,
+    "user_service.get_all_users": first_two_pages(lambda db, ctx, cursor: user_service.get_all_users(db, cursor=cursor, page_size=2)),
+    "statuss.create+get+update+delete": create_and_delete_status,
+}
+
+
+@pytest.fixture
+def ctx(db):
+    user = make_user(db)
+    make_user(db)
+    make_user(db)
+    catalog = make_products(db, 3)
+    orders = make_orders(db, user, catalog, 3)
+    return {
+        "user": user,
+        "products": catalog,
+        "product_ids": [product.id for product in catalog],
+        "order_id": str(orders[0].id),
+        "order_ids": [order.id for order in orders],
+    }
+
+
+def capture_statements(db, scenario, ctx: dict) -> list[tuple[str, object]]:
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().lower().startswith(EXPLAINED_PREFIXES):
+            # Batches are explained with their first parameter set
+            if executemany and isinstance(parameters, (list, tuple)):
+                parameters = parameters[0]
+            captured.append((statement, parameters))
+
+    conn = db.connection()
+    event.listen(conn, "before_cursor_execute", capture)
+    try:
+        scenario(db, ctx)
+    finally:
+        event.remove(conn, "before_cursor_execute", capture)
+    return captured
+
+
+def seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") in ("Seq Scan", "Parallel Seq Scan") and plan.get("Relation Name") not in FULL_SCAN_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_statements_can_use_an_index(db, ctx, name):
+    statements = capture_statements(db, SCENARIOS[name], ctx)
+    assert statements, "scenario issued no statements"
+
+    conn = db.connection()
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    problems = []
+    for statement, parameters in statements:
+        (plan,) = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+        scans = seq_scans(plan["Plan"])
+        if scans:
+            problems.append(f"seq scan on {', '.join(scans)}: {' '.join(statement.split())}")
+    assert not problems, "\n".join(problems)
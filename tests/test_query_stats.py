@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from app.database import track_queries
+
+
+def test_failed_statements_leave_no_timer_state_on_the_connection(db):
+    with track_queries() as stats:
+        for _ in range(3):
+            with pytest.raises(ProgrammingError), db.begin_nested():
+                db.execute(text("SELECT * FROM no_such_table"))
+        db.execute(text("SELECT 1"))
+
+    assert "query_start_time" not in db.connection().info
+    assert stats.shapes["SELECT 1"] == 1
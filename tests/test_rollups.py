@@ -0,0 +1,60 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from app import models, schemas
+from app.services import order_service, outbox, rollups
+from app.services.status_registry import registry
+from tests.factories import make_products, make_user
+
+
+def status_sales(db, day: date) -> dict:
+    return {row["status"]: (row["order_count"], row["revenue"]) for row in rollups.get_status_sales(db, day, day)}
+
+
+def product_sales(db, day: date, product_id) -> tuple:
+    rows = rollups.get_product_sales(db, day, day, product_id)
+    return (rows[0].quantity, rows[0].revenue) if rows else (0, Decimal(0))
+
+
+def test_rollups_follow_order_events_once_dispatched(db):
+    today = datetime.now(timezone.utc).date()
+    user = make_user(db)
+    first, second = make_products(db, 2, price=5.0)
+    request = schemas.OrderCreateRequest(products=[
+        schemas.ProductOrder(product_id=first.id, quantity=2),
+        schemas.ProductOrder(product_id=second.id, quantity=1),
+    ])
+    before = status_sales(db, today)
+
+    kept = order_service.create_order(db, user.id, request)
+    canceled = order_service.create_order(db, user.id, request)
+    order_service.cancel_order(str(canceled.id), db)
+    shipped = order_service.create_order(db, user.id, request)
+    order_service.update_order_status(str(shipped.id), "shipped", db)
+    # Nothing is counted until the dispatcher delivers the events
+    assert product_sales(db, today, first.id) == (0, Decimal(0))
+
+    outbox.dispatch_batch(db, 100)
+
+    after = status_sales(db, today)
+    for name in ("pending", "canceled", "shipped"):
+        count, revenue = before.get(name, (0, Decimal(0)))
+        assert after[name] == (count + 1, revenue + Decimal("15.00"))
+    assert product_sales(db, today, first.id) == (4, Decimal("20.00"))
+    assert product_sales(db, today, second.id) == (2, Decimal("10.00"))
+    assert db.get(models.Order, kept.id).status_id == registry.get_id(db, "pending")
+
+
+def test_bulk_cancel_follows_the_single_order_rules(db):
+    user = make_user(db)
+    (product,) = make_products(db, 1)
+    request = schemas.OrderCreateRequest(products=[schemas.ProductOrder(product_id=product.id, quantity=1)])
+    pending = order_service.create_order(db, user.id, request)
+    shipped = order_service.create_order(db, user.id, request)
+    order_service.update_order_status(str(shipped.id), "shipped", db)
+
+    results = order_service.bulk_update_order_status([pending.id, shipped.id], "canceled", db)
+
+    assert [result["result"] for result in results] == ["updated", "rejected"]
+    assert results[1]["previous_status"] == "shipped"
+    canceled_events = db.query(models.OutboxEvent).filter(models.OutboxEvent.event_type == outbox.ORDER_CANCELED).all()
+    assert [event.payload["order_id"] for event in canceled_events] == [str(pending.id)]
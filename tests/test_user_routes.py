@@ -0,0 +1,36 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import database, schemas
+from app.api.routes import dependencies
+from app.main import app
+from tests.factories import make_user
+
+
+@pytest.fixture
+def client(db):
+    user = make_user(db)
+    principal = schemas.Principal(id=user.id, is_active=True, is_admin=False)
+
+    async def session():
+        yield db
+
+    app.dependency_overrides[database.get_db_session] = session
+    app.dependency_overrides[dependencies.get_current_user] = lambda: principal
+    try:
+        yield TestClient(app), user
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_get_user_details_serializes_the_user(client):
+    client, user = client
+    response = client.get(f"/api/v1/users/users/{user.id}")
+    assert response.status_code == 200
+    assert response.json()["username"] == user.username
+
+
+def test_update_user_serializes_the_updated_user(client):
+    client, user = client
+    response = client.put(f"/api/v1/users/users/{user.id}", json={"username": "renamed-user", "password": "Newpass12!"})
+    assert response.status_code == 200
+    assert response.json()["username"] == "renamed-user"